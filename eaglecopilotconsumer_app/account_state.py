@@ -0,0 +1,253 @@
+import gzip
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from transaction_codec import parse_amount, timestamp_seconds
+
+# Dormancy: an account silent this long that suddenly moves a large amount
+DORMANT_AFTER_DAYS = float(os.getenv("DORMANT_AFTER_DAYS", 90))
+LARGE_TRANSFER_AMOUNT = float(os.getenv("LARGE_TRANSFER_AMOUNT", 10000))  # USD
+# Velocity: transactions and amount sent by one account within the window
+VELOCITY_WINDOW_SECONDS = int(os.getenv("VELOCITY_WINDOW_SECONDS", 3600))
+VELOCITY_MAX_COUNT = int(os.getenv("VELOCITY_MAX_COUNT", 20))
+VELOCITY_MAX_AMOUNT = float(os.getenv("VELOCITY_MAX_AMOUNT", 250000))  # USD
+# Structuring: repeated amounts just below the reporting threshold within the window
+STRUCTURING_THRESHOLD = float(os.getenv("STRUCTURING_THRESHOLD", 10000))  # USD
+STRUCTURING_MARGIN = float(os.getenv("STRUCTURING_MARGIN", 0.1))  # fraction below the threshold
+STRUCTURING_MIN_COUNT = int(os.getenv("STRUCTURING_MIN_COUNT", 3))
+# A large transfer outside the account's usual corridor, once it has this much history
+CORRIDOR_MIN_HISTORY = int(os.getenv("CORRIDOR_MIN_HISTORY", 5))
+# Bounds on the state kept in memory
+ACCOUNT_STATE_MAX_ACCOUNTS = int(os.getenv("ACCOUNT_STATE_MAX_ACCOUNTS", 50000))  # per partition, ~400 bytes each
+ACCOUNT_STATE_TTL_DAYS = float(os.getenv("ACCOUNT_STATE_TTL_DAYS", 180))  # must exceed DORMANT_AFTER_DAYS
+
+DAY_SECONDS = 86400
+# Bump when AccountState.__slots__ (the layout of snapshot rows) changes
+SNAPSHOT_VERSION = 2
+
+def transaction_time(transaction: Dict, default: float) -> float:
+    """Transaction timestamp as epoch seconds (naive ones are UTC), or default if it is missing or invalid."""
+    seconds = timestamp_seconds(transaction.get("timestamp"))
+    return default if seconds is None else seconds
+
+def encode_snapshot(rows: List[List], clock: float, pending: Dict[str, List[str]]) -> bytes:
+    """Gzipped JSON snapshot of AccountStateStore.snapshot_rows()."""
+    body = json.dumps({"version": SNAPSHOT_VERSION, "clock": clock, "accounts": rows, "pending": pending},
+                      separators=(",", ":"))
+    return gzip.compress(body.encode("utf-8"), compresslevel=6)
+
+class AccountState:
+    """
+    What is remembered about one sending account: when it was last seen,
+    its totals in the current and previous velocity window, and its usual
+    corridor (majority vote over its transactions).
+    """
+    __slots__ = ("last_seen", "window_start", "count", "amount", "near", "previous_count",
+                 "previous_amount", "previous_near", "corridor", "corridor_weight", "transactions")
+
+    def __init__(self, last_seen: float):
+        self.last_seen = last_seen
+        self.window_start = 0.0
+        self.count, self.amount, self.near = 0, 0.0, 0
+        self.previous_count, self.previous_amount, self.previous_near = 0, 0.0, 0
+        self.corridor: Optional[str] = None
+        self.corridor_weight = 0
+        self.transactions = 0
+
+    def add(self, now: float, amount: float, near_threshold: bool, window: int) -> Tuple[float, float, float]:
+        """
+        Add a transaction and return the sliding window totals (count,
+        amount, near-threshold count). The sliding window is estimated from
+        two fixed windows: all of the current one plus the part of the
+        previous one it still overlaps.
+        """
+        if now >= self.window_start + window:
+            if now < self.window_start + 2 * window:
+                self.previous_count, self.previous_amount, self.previous_near = self.count, self.amount, self.near
+            else:
+                self.previous_count, self.previous_amount, self.previous_near = 0, 0.0, 0
+            self.window_start = now - now % window
+            self.count, self.amount, self.near = 0, 0.0, 0
+        # Late transactions from an earlier window are counted in the current one
+        self.count += 1
+        self.amount += amount
+        self.near += near_threshold
+        overlap = max(0.0, 1.0 - (now - self.window_start) / window)
+        return (self.count + self.previous_count * overlap, self.amount + self.previous_amount * overlap,
+                self.near + self.previous_near * overlap)
+
+    def vote(self, corridor: str):
+        """Boyer-Moore majority vote: the corridor used most often wins in O(1) memory."""
+        if corridor == self.corridor:
+            self.corridor_weight += 1
+        elif self.corridor_weight == 0:
+            self.corridor, self.corridor_weight = corridor, 1
+        else:
+            self.corridor_weight -= 1
+
+class AccountStateStore:
+    """
+    Stateful detection over the stream of transactions, keyed by the
+    sender's account number.
+
+    Flags dormancy breaks (a large transfer from an account silent for
+    DORMANT_AFTER_DAYS), velocity spikes (too many transactions or too much
+    money within the sliding window), structuring (repeated amounts just
+    below the reporting threshold) and large transfers outside the
+    account's usual corridor. Every transaction costs O(1) and every
+    account a fixed set of counters. Memory is bounded: accounts are kept in
+    LRU order and dropped once unseen for the TTL or beyond max_accounts.
+
+    The flags of transactions observed but not yet written are kept as
+    pending until commit(). A snapshot taken together with a checkpoint
+    therefore covers exactly the events after it that were observed: when
+    they are replayed they get their recorded flags back instead of being
+    counted twice.
+    """
+
+    def __init__(self, max_accounts: int = ACCOUNT_STATE_MAX_ACCOUNTS,
+                 ttl_days: float = ACCOUNT_STATE_TTL_DAYS):
+        self.max_accounts = max_accounts
+        self.ttl = ttl_days * DAY_SECONDS
+        self.dormant_after = DORMANT_AFTER_DAYS * DAY_SECONDS
+        self.structuring_floor = STRUCTURING_THRESHOLD * (1 - STRUCTURING_MARGIN)
+        self.accounts: "OrderedDict[str, AccountState]" = OrderedDict()
+        # Latest transaction time seen; drives TTL eviction
+        self.clock = 0.0
+        self.evicted = 0
+        self.flagged: Dict[str, int] = {}
+        # transaction_id -> flags, for transactions observed but not yet written
+        self.pending: Dict[str, List[str]] = {}
+        # Transactions observed (not replayed) so far; unchanged means no new snapshot is needed
+        self.observed = 0
+        self.replayed = 0
+        # Version of the snapshot file last loaded or saved
+        self.etag: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def observe(self, transaction: Dict) -> List[str]:
+        """Update the sender's state with a transaction and return the flags it raised."""
+        account = (transaction.get("sender") or {}).get("account_number")
+        if not account:
+            return []
+        transaction_id = transaction.get("transaction_id")
+        if transaction_id is not None:
+            flags = self.pending.get(transaction_id)
+            if flags is not None:
+                # Already counted: replayed before it was written
+                self.replayed += 1
+                return flags
+        now = transaction_time(transaction, self.clock or time.time())
+        self.clock = max(self.clock, now)
+        # Amounts may arrive as numeric strings; unparseable ones count as 0
+        amount = parse_amount(transaction.get("amount_usd")) or 0.0
+        flags = []
+
+        state = self.accounts.get(account)
+        if state is None:
+            state = self.accounts[account] = AccountState(now)
+        else:
+            self.accounts.move_to_end(account)
+            if now - state.last_seen >= self.dormant_after and amount >= LARGE_TRANSFER_AMOUNT:
+                flags.append("dormant_account")
+
+        near_threshold = self.structuring_floor <= amount < STRUCTURING_THRESHOLD
+        count, total, near = state.add(now, amount, near_threshold, VELOCITY_WINDOW_SECONDS)
+        if count > VELOCITY_MAX_COUNT or (count > 1 and total > VELOCITY_MAX_AMOUNT):
+            flags.append("velocity_spike")
+        if near_threshold and near >= STRUCTURING_MIN_COUNT:
+            flags.append("structuring")
+
+        corridor = f"{transaction.get('sender_country')}-{transaction.get('receiver_country')}"
+        if (state.transactions >= CORRIDOR_MIN_HISTORY and corridor != state.corridor
+                and amount >= LARGE_TRANSFER_AMOUNT):
+            flags.append("unusual_corridor")
+        state.vote(corridor)
+        state.transactions += 1
+        state.last_seen = max(state.last_seen, now)
+
+        for flag in flags:
+            self.flagged[flag] = self.flagged.get(flag, 0) + 1
+        if transaction_id is not None:
+            self.pending[transaction_id] = flags
+        self.observed += 1
+        self._evict()
+        return flags
+
+    def evaluate_batch(self, transactions: List[Dict]) -> List[List[str]]:
+        """Observe transactions in order; the flags raised by each."""
+        return [self.observe(transaction) for transaction in transactions]
+
+    def commit(self, transactions: Iterable[Dict]):
+        """Forget the pending flags of transactions that are now durably written."""
+        pending = self.pending
+        for transaction in transactions:
+            pending.pop(transaction.get("transaction_id"), None)
+
+    def _evict(self):
+        accounts = self.accounts
+        while len(accounts) > self.max_accounts:
+            accounts.popitem(last=False)
+            self.evicted += 1
+        expired = self.clock - self.ttl
+        while accounts and next(iter(accounts.values())).last_seen < expired:
+            accounts.popitem(last=False)
+            self.evicted += 1
+
+    def snapshot_rows(self) -> List[List]:
+        """
+        Copy of the state (least recently seen first), cheap enough to take
+        on the event loop. Take it together with the checkpoint it matches.
+        """
+        return [[account] + [getattr(state, field) for field in AccountState.__slots__]
+                for account, state in self.accounts.items()]
+
+    def restore(self, snapshot: bytes):
+        """Replace the state with a snapshot written by save()."""
+        data = json.loads(gzip.decompress(snapshot))
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported account state snapshot version: {data.get('version')}")
+        self.accounts.clear()
+        for account, *values in data["accounts"]:
+            state = AccountState(0.0)
+            for field, value in zip(AccountState.__slots__, values):
+                setattr(state, field, value)
+            self.accounts[account] = state
+        self.pending = data["pending"]
+        self.clock = max(self.clock, data["clock"])
+        self._evict()
+
+    async def save(self, file_client, encoder=None) -> int:
+        """
+        Upload a snapshot to a Data Lake file, serializing it in encoder
+        (a worker_pool.EncodePool) if given. Returns its size in bytes.
+        """
+        rows, pending = self.snapshot_rows(), dict(self.pending)
+        if encoder is None:
+            content = encode_snapshot(rows, self.clock, pending)
+        else:
+            content = await encoder.run(encode_snapshot, rows, self.clock, pending)
+        result = await file_client.upload_data(content, overwrite=True)
+        self.etag = result.get("etag")
+        return len(content)
+
+    async def load(self, file_client) -> bool:
+        """Restore from a Data Lake file; False if no snapshot exists yet."""
+        try:
+            download = await file_client.download_file()
+        except ResourceNotFoundError:
+            return False
+        self.restore(await download.readall())
+        self.etag = download.properties.etag
+        return True
+
+    def report(self) -> Dict:
+        return {"accounts": len(self.accounts), "evicted": self.evicted, "pending": len(self.pending),
+                "replayed": self.replayed, "flagged": dict(self.flagged)}
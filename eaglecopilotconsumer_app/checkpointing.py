@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Checkpoint a partition at most every N durable events or T seconds
+CHECKPOINT_EVERY_EVENTS = int(os.getenv("CHECKPOINT_EVERY_EVENTS", 500))
+CHECKPOINT_EVERY_SECONDS = float(os.getenv("CHECKPOINT_EVERY_SECONDS", 30))
+
+# partition_id -> (partition_context, event, events since the previous position)
+Positions = Dict[str, Tuple[object, object, int]]
+
+class PartitionCheckpointer:
+    """
+    Decouples Event Hub checkpoints from event handling.
+
+    Events are buffered per partition (see partition_buffer.PartitionBuffer).
+    Once every record of an event has been written to the Data Lake, the
+    buffer hands its position over as durable, and a partition is only
+    checkpointed up to its last durable event, at most every `every_events`
+    events or `every_seconds` seconds. A restart can therefore replay events
+    but never skip unwritten ones (at-least-once). `on_checkpoint` is called
+    with each checkpointed event.
+
+    `before_checkpoint(partition_id, force)` is awaited just before a
+    partition is checkpointed. It starts right after the durable position is
+    read, with no await in between, so state it copies before its own first
+    await matches the checkpoint; uploads finishing in the background while
+    it runs only advance the next checkpoint. If it raises, the checkpoint
+    is not written. A partition is checkpointed by one call at a time, so
+    checkpoints (and their snapshots) never go backwards.
+    """
+
+    def __init__(self, every_events: int = CHECKPOINT_EVERY_EVENTS,
+                 every_seconds: float = CHECKPOINT_EVERY_SECONDS,
+                 on_checkpoint: Optional[Callable[[object], None]] = None,
+                 before_checkpoint: Optional[Callable[[str, bool], Awaitable[None]]] = None):
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.on_checkpoint = on_checkpoint
+        self.before_checkpoint = before_checkpoint
+        self.durable: Positions = {}
+        self.last_checkpoint: Dict[str, float] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.checkpoints_written = 0
+
+    def mark_durable(self, positions: Positions):
+        """Promote positions whose events have been written to the Data Lake."""
+        for partition_id, (partition_context, event, count) in positions.items():
+            previous = self.durable.get(partition_id)
+            total = previous[2] + count if previous else count
+            self.durable[partition_id] = (partition_context, event, total)
+            self.last_checkpoint.setdefault(partition_id, time.monotonic())
+
+    async def maybe_checkpoint(self, force: bool = False, partition_id: Optional[str] = None) -> int:
+        """
+        Checkpoint every partition (or only partition_id) whose durable
+        position is due. Returns the number of checkpoints written. A
+        partition already being checkpointed by another call is skipped,
+        unless force waits for it and then checkpoints what is left.
+        """
+        written = 0
+        partition_ids = list(self.durable) if partition_id is None else [partition_id]
+        for partition_id in partition_ids:
+            lock = self.locks.setdefault(partition_id, asyncio.Lock())
+            if lock.locked() and not force:
+                continue
+            async with lock:
+                written += await self._checkpoint(partition_id, force)
+        self.checkpoints_written += written
+        return written
+
+    async def _checkpoint(self, partition_id: str, force: bool) -> int:
+        # Read the position afresh: uploads may have completed while waiting for the lock
+        position = self.durable.get(partition_id)
+        if position is None:
+            return 0
+        partition_context, event, count = position
+        due = (count >= self.every_events
+               or time.monotonic() - self.last_checkpoint.get(partition_id, 0.0) >= self.every_seconds)
+        if not (force or due):
+            return 0
+        if self.before_checkpoint is not None:
+            await self.before_checkpoint(partition_id, force)
+        await partition_context.update_checkpoint(event)
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(event)
+        # Only drop the position if no newer durable event arrived meanwhile
+        if self.durable.get(partition_id, (None, None))[1] is event:
+            del self.durable[partition_id]
+        self.last_checkpoint[partition_id] = time.monotonic()
+        return 1
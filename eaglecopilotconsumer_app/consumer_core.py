@@ -0,0 +1,664 @@
+import asyncio
+import logging
+import json
+import os
+import time
+import signal
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from azure.eventhub.aio import EventHubConsumerClient
+from azure.eventhub.extensions.checkpointstoreblobaio import BlobCheckpointStore
+from azure.storage.filedatalake.aio import DataLakeServiceClient
+from dotenv import load_dotenv
+
+from checkpointing import PartitionCheckpointer
+from datalake_writer import DataLakeWriter
+from event_log import EventLog
+from flush_executor import FlushExecutor
+from latency_metrics import ConsumerMetrics
+from partition_buffer import FLUSH_CHECK_INTERVAL, FlushStats, PartitionBuffer
+from partition_state import PartitionState, partition_state
+from rule_engine import RuleEngine
+from transaction_codec import decode_event_payload
+from worker_pool import LoopLagMonitor
+
+# Load environment variables
+load_dotenv()
+
+# Azure Event Hub Configuration
+EVENT_HUB_CONNECTION_STR = os.getenv("EVENT_HUB_CONNECTION_STR")
+EVENT_HUB_NAME = os.getenv("EVENT_HUB_NAME")
+CONSUMER_GROUP = os.getenv("EVENT_HUB_CONSUMER_GROUP", "preview_data_consumer_group")  # default of the function app
+# Partition ownership is renewed (and rebalanced across consumers) at this interval
+LOAD_BALANCING_INTERVAL = float(os.getenv("CONSUMER_LOAD_BALANCING_INTERVAL", 10))  # seconds
+
+# Azure Storage Configuration
+STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
+STORAGE_SAS_TOKEN = os.getenv("AZURE_SAS_TOKEN")
+CHECKPOINT_CONTAINER = os.getenv("CHECKPOINT_CONTAINER", "checkpoints")
+NORMAL_CONTAINER = os.getenv("NORMAL_CONTAINER", "normal-transactions")
+SUSPICIOUS_CONTAINER = os.getenv("SUSPICIOUS_CONTAINER", "suspicious-transactions")
+# Containers written as rolling, appended files (suspicious files stay one per
+# flush so the alert trigger sees each file once, complete)
+ROLLING_CONTAINERS = [name for name in os.getenv("DATALAKE_ROLLING_CONTAINERS", NORMAL_CONTAINER).split(",") if name]
+
+# Construct the storage account URL
+STORAGE_URL = f"https://{STORAGE_ACCOUNT_NAME}.dfs.core.windows.net"
+
+# Receive mode: per-event callbacks, or batches through on_event_batch
+RECEIVE_MODE = os.getenv("CONSUMER_RECEIVE_MODE", "event")  # event | batch
+MAX_BATCH_SIZE = int(os.getenv("CONSUMER_MAX_BATCH_SIZE", 300))
+MAX_BATCH_WAIT_TIME = float(os.getenv("CONSUMER_MAX_BATCH_WAIT_TIME", 5))  # seconds
+
+# Stateful per-account detection (dormancy, velocity, structuring), per partition
+STATEFUL_DETECTION = os.getenv("STATEFUL_DETECTION", "false").lower() == "true"
+# Deduplication by transaction_id, per partition
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+
+def create_checkpoint_store() -> BlobCheckpointStore:
+    return BlobCheckpointStore(
+        blob_account_url=f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net",
+        container_name=CHECKPOINT_CONTAINER,
+        credential=STORAGE_SAS_TOKEN
+    )
+
+def event_hub_namespace(connection_str: Optional[str]) -> str:
+    """Fully qualified namespace from an "Endpoint=sb://<namespace>/;..." connection string."""
+    for part in (connection_str or "").split(";"):
+        key, _, value = part.partition("=")
+        if key.strip().lower() == "endpoint":
+            return value.strip().split("://", 1)[-1].rstrip("/")
+    return ""
+
+async def service_is_active(consumer_group: str = CONSUMER_GROUP,
+                            within_seconds: float = 3 * LOAD_BALANCING_INTERVAL) -> bool:
+    """
+    Whether a consumer currently owns partitions of the consumer group,
+    judging by the ownership records it renews in the checkpoint store.
+    Consumers release their ownership when they stop.
+    """
+    checkpoint_store = create_checkpoint_store()
+    try:
+        ownership = await checkpoint_store.list_ownership(
+            event_hub_namespace(EVENT_HUB_CONNECTION_STR), EVENT_HUB_NAME, consumer_group)
+    finally:
+        await checkpoint_store.close()
+    now = time.time()
+    return any(record.get("owner_id") and now - (record.get("last_modified_time") or 0) < within_seconds
+               for record in ownership)
+
+class ConsumerHealth:
+    """
+    Liveness and lag figures of a running consumer: the partitions it owns
+    and, per partition, the events processed and how far behind their
+    enqueue time processing runs.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.receiving = False
+        self.owned: Set[str] = set()
+        self.partitions: Dict[str, Dict[str, float]] = {}
+
+    def record(self, partition_id: str, event, count: int = 1):
+        """Note the last event processed from a partition (covering count events)."""
+        stats = self.partitions.setdefault(partition_id, {"events": 0})
+        now = time.time()
+        stats["events"] += count
+        stats["last_event_at"] = now
+        stats["last_sequence_number"] = event.sequence_number
+        if event.enqueued_time is not None:
+            stats["last_enqueued_time"] = event.enqueued_time.timestamp()
+            stats["processing_delay_seconds"] = max(0.0, now - stats["last_enqueued_time"])
+
+class TransactionProcessor:
+    """
+    Event Hub consumer shared by the standalone script, the timer function
+    and the consumer service: classifies transactions, buffers them per
+    partition, writes them to the Data Lake and checkpoints what was written.
+    """
+
+    def __init__(self, shutdown_event: Optional[asyncio.Event] = None, consumer_group: str = CONSUMER_GROUP):
+        self.consumer_group = consumer_group
+        self.buffers: Dict[str, PartitionBuffer] = {}
+        # Consumer lag and end-to-end latency
+        self.telemetry = ConsumerMetrics()
+        # Per-transaction logs are counted and sampled
+        self.event_log = EventLog(logging.getLogger(__name__))
+        self.checkpointer = PartitionCheckpointer(on_checkpoint=self.telemetry.observe_checkpoint,
+                                                  before_checkpoint=self.checkpoint_state)
+        self.flush_stats = FlushStats()
+        self.executor = FlushExecutor()
+        self.loop_monitor = LoopLagMonitor()
+        # Suspicious transaction rules (transaction_rules.json), reloaded when the file changes
+        self.rules = RuleEngine()
+        # Per-partition account state and written transaction ids, kept for the life of the process
+        self.partitions: Dict[str, PartitionState] = {}
+        self.shutdown_event = shutdown_event or asyncio.Event()
+        self.health = ConsumerHealth()
+        
+        # Initialize DataLake client with SAS token
+        self.datalake_service_client = DataLakeServiceClient(
+            account_url=STORAGE_URL,
+            credential=STORAGE_SAS_TOKEN
+        )
+        self.writer = DataLakeWriter(self.datalake_service_client, rolling_containers=ROLLING_CONTAINERS)
+
+    def setup_shutdown_handler(self):
+        """
+        Set up platform-independent shutdown handling
+        """
+        if sys.platform != 'win32':
+            # Unix-like systems
+            loop = asyncio.get_event_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, self._signal_handler)
+        else:
+            # Windows systems
+            signal.signal(signal.SIGINT, self._win_signal_handler)
+            signal.signal(signal.SIGTERM, self._win_signal_handler)
+
+    def _signal_handler(self):
+        """
+        Signal handler for Unix-like systems
+        """
+        logging.info("Shutdown signal received. Starting graceful shutdown...")
+        self.shutdown_event.set()
+
+    def _win_signal_handler(self, signum, frame):
+        """
+        Signal handler for Windows systems
+        """
+        logging.info("Shutdown signal received. Starting graceful shutdown...")
+        self.shutdown_event.set()
+        
+    def is_suspicious(self, transaction: Dict) -> bool:
+        """
+        Determine if a transaction is suspicious: whether any rule fires.
+        """
+        return bool(self.rules.evaluate(transaction))
+
+    def classify_batch(self, transactions: List[Dict],
+                       partition_id: Optional[str] = None) -> Tuple[List[Dict], List[Dict], List[List[str]]]:
+        """
+        Split a batch of transactions into (normal, suspicious), evaluating
+        every rule over the whole batch, then the stateful account checks of
+        the partition. Also returns the rules fired by each suspicious transaction.
+        """
+        detected = self.rules.evaluate_batch(transactions)
+        accounts = self.get_state(partition_id).accounts if partition_id is not None else None
+        if accounts is not None:
+            detected = [rules + flags for rules, flags in zip(detected, accounts.evaluate_batch(transactions))]
+        normal, suspicious, fired = [], [], []
+        for transaction, rules in zip(transactions, detected):
+            if rules:
+                suspicious.append(transaction)
+                fired.append(rules)
+            else:
+                normal.append(transaction)
+        return normal, suspicious, fired
+
+    def detect(self, transaction: Dict, partition_id: Optional[str] = None) -> List[str]:
+        """
+        Rules fired by a single transaction, including the stateful account
+        checks of the partition.
+        """
+        rules = self.rules.evaluate(transaction)
+        accounts = self.get_state(partition_id).accounts if partition_id is not None else None
+        if accounts is not None:
+            rules += accounts.observe(transaction)
+        return rules
+
+    def reload_rules(self):
+        """
+        Pick up changes to the rules file; invalid rules keep the current ones.
+        """
+        try:
+            if self.rules.maybe_reload():
+                logging.info("Loaded %d transaction rules from %s", len(self.rules.rules), self.rules.source)
+        except (OSError, ValueError) as e:
+            logging.error("Keeping the current transaction rules: %s", e)
+
+    def deduplicate(self, transactions: List[Dict], partition_id: str) -> List[Dict]:
+        """
+        Drop transactions already written or buffered from the partition,
+        such as events replayed from the last checkpoint.
+        """
+        dedup = self.get_state(partition_id).dedup
+        if dedup is None:
+            return transactions
+        bloom_only_hits = dedup.bloom_only_hits
+        unique = dedup.filter(transactions)
+        if len(unique) < len(transactions):
+            self.event_log.count("duplicate", len(transactions) - len(unique))
+            if dedup.bloom_only == "drop" and dedup.bloom_only_hits > bloom_only_hits:
+                # Probable duplicates, possibly false positives; see Deduplicator.report()
+                self.event_log.count("duplicate_bloom_only", dedup.bloom_only_hits - bloom_only_hits)
+        return unique
+
+    def get_state(self, partition_id: str) -> PartitionState:
+        """
+        Return the detection and dedup state of a partition: the one this
+        process already keeps, or an empty one (on_partition_initialize
+        restores it from its snapshots).
+        """
+        state = self.partitions.get(partition_id)
+        if state is None:
+            state = self.partitions[partition_id] = partition_state(
+                EVENT_HUB_NAME, self.consumer_group, partition_id, STATEFUL_DETECTION, DEDUP_ENABLED)
+        return state
+
+    def state_file(self, path: str):
+        file_system_client = self.datalake_service_client.get_file_system_client(CHECKPOINT_CONTAINER)
+        return file_system_client.get_file_client(path)
+
+    async def load_partition_state(self, partition_id: str):
+        """
+        Restore the account and dedup state of a partition from its
+        snapshots, so a restart or a partition taken over from another
+        consumer neither starts the detection windows cold nor rewrites
+        replayed transactions. Snapshots this process already holds are not
+        downloaded again; without a readable snapshot the state starts empty.
+        """
+        state = self.get_state(partition_id)
+        try:
+            for name in await state.load(self.state_file):
+                logging.info("Restored %s of partition %s", name, partition_id)
+        except Exception as e:
+            logging.error("Could not restore the state of partition %s, starting empty: %s", partition_id, e)
+
+    async def checkpoint_state(self, partition_id: str, force: bool = False):
+        """
+        Snapshot the state of a partition just before it is checkpointed
+        (PartitionCheckpointer.before_checkpoint). A failed account state
+        snapshot fails the checkpoint too, so the two never disagree; the
+        dedup snapshot is best effort.
+        """
+        state = self.partitions.get(partition_id)
+        if state is None:
+            return
+        try:
+            size = await state.save_accounts(self.state_file, self.writer.encoder)
+            if size is not None:
+                logging.info("Saved account state of partition %s (%d bytes)", partition_id, size)
+        except Exception as e:
+            logging.error("Error saving account state of partition %s, not checkpointing it: %s", partition_id, e)
+            raise
+        await self.save_dedup_state(partition_id, force)
+
+    async def save_dedup_state(self, partition_id: str, force: bool = False):
+        """Snapshot the dedup state of a partition if it is due (or force)."""
+        state = self.partitions[partition_id]
+        try:
+            size = await state.save_dedup(self.state_file, self.writer.encoder, force)
+            if size is not None:
+                logging.info("Saved dedup state of partition %s (%d ids, %d bytes)",
+                             partition_id, len(state.dedup), size)
+        except Exception as e:
+            logging.error("Error saving dedup state of partition %s: %s", partition_id, e)
+
+    async def save_state(self):
+        """
+        Snapshot the dedup state of every partition, and the account state
+        of partitions with nothing written since their last checkpoint (the
+        others are snapshotted when they are checkpointed).
+        """
+        for partition_id in list(self.partitions):
+            if partition_id in self.checkpointer.durable:
+                await self.save_dedup_state(partition_id, force=True)
+                continue
+            try:
+                await self.checkpoint_state(partition_id, force=True)
+            except Exception:
+                # Logged; the previous snapshot still matches the checkpoint
+                pass
+
+    def metrics(self) -> Dict:
+        """
+        Health and lag metrics: owned partitions, per-partition progress,
+        buffered and in-flight records, events awaiting a checkpoint, flush
+        statistics, event loop lag, consumer lag and latency percentiles.
+        """
+        partitions = {}
+        for partition_id in sorted(set(self.health.partitions) | self.health.owned):
+            stats = dict(self.health.partitions.get(partition_id, {}))
+            buffer = self.buffers.get(partition_id)
+            stats["owned"] = partition_id in self.health.owned
+            stats["buffered"] = len(buffer) if buffer else 0
+            stats["in_flight"] = sum(len(chunk.records) for container in buffer.containers
+                                     for chunk in container.in_flight) if buffer else 0
+            stats["uncheckpointed_events"] = buffer.tracked - buffer.durable_upto if buffer else 0
+            durable = self.checkpointer.durable.get(partition_id)
+            stats["uncheckpointed_events"] += durable[2] if durable else 0
+            partitions[partition_id] = stats
+        return {
+            "receiving": self.health.receiving,
+            "uptime_seconds": time.time() - self.health.started_at,
+            "owned_partitions": sorted(self.health.owned),
+            "partitions": partitions,
+            "uploads_in_flight": self.executor.in_flight,
+            "checkpoints_written": self.checkpointer.checkpoints_written,
+            "flush": self.flush_stats.report(),
+            "event_loop_lag": self.loop_monitor.report(),
+            **self.telemetry.report(),
+        }
+
+    def is_healthy(self) -> bool:
+        """Receiving from Event Hub (partitions may be owned by other consumers)."""
+        return self.health.receiving and not self.shutdown_event.is_set()
+
+    async def on_partition_initialize(self, partition_context):
+        self.health.owned.add(partition_context.partition_id)
+        logging.info("Claimed partition %s", partition_context.partition_id)
+        await self.load_partition_state(partition_context.partition_id)
+
+    async def on_partition_close(self, partition_context, reason):
+        """
+        Another consumer took the partition over (or the client is closing):
+        write what is buffered for it and checkpoint, so the new owner
+        replays as little as possible.
+        """
+        partition_id = partition_context.partition_id
+        self.health.owned.discard(partition_id)
+        logging.info("Released partition %s: %s", partition_id, reason)
+        if not self.health.receiving:
+            # Shutting down; flush_all() writes every partition
+            return
+        try:
+            await self.process_batch(partition_id)
+            await self.executor.drain()
+            await self.checkpointer.maybe_checkpoint(force=True, partition_id=partition_id)
+            await self.save_dedup_state(partition_id, force=True)
+        except Exception as e:
+            logging.error("Error flushing released partition %s: %s", partition_id, e)
+
+    def get_buffer(self, partition_id: str) -> PartitionBuffer:
+        """
+        Return the buffer of a partition, creating it on first use.
+        """
+        buffer = self.buffers.get(partition_id)
+        if buffer is None:
+            buffer = self.buffers[partition_id] = PartitionBuffer(partition_id)
+        return buffer
+
+    async def save_to_datalake(self, transactions: List[Dict], container_name: str, batch_id: str):
+        """
+        Save transactions to Azure Data Lake Storage: appended to the open
+        rolling file of a rolling container, otherwise as a new file.
+        """
+        if not transactions:
+            return
+
+        try:
+            for file_path, count in await self.writer.write(container_name, transactions, batch_id):
+                logging.info("Saved %d transactions to %s/%s", count, container_name, file_path)
+        
+        except Exception as e:
+            logging.error("Error saving to Data Lake: %s", e)
+            # Log additional details for debugging
+            logging.error("Container: %s, Batch: %s", container_name, batch_id)
+            raise
+
+    async def process_batch(self, partition_id: Optional[str] = None, due_only: bool = False):
+        """
+        Hand the transactions buffered for one partition (or for all
+        partitions) to the flush executor, one upload per container. With
+        due_only, only containers whose flush policy is due are written.
+        Uploads run in the background; flush_all() waits for them.
+        """
+        if partition_id is None:
+            for buffer_id in list(self.buffers):
+                await self.process_batch(buffer_id, due_only)
+            return
+
+        buffer = self.get_buffer(partition_id)
+        containers = buffer.due_containers() if due_only else [c for c in buffer.containers if c.records]
+        for container in containers:
+            container_name = NORMAL_CONTAINER if container is buffer.normal else SUSPICIOUS_CONTAINER
+            batch_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_p{partition_id}"
+            age = container.age()
+
+            # Detach the records, so events arriving during the upload are
+            # neither lost nor checkpointed early
+            chunk = buffer.take(container)
+            try:
+                await self.executor.submit(
+                    container_name, self.upload_chunk(buffer, container, chunk, container_name, batch_id, age))
+            except BaseException:
+                buffer.restore(container, chunk)
+                raise
+
+    async def upload_chunk(self, buffer: PartitionBuffer, container, chunk, container_name: str,
+                           batch_id: str, age: float):
+        """
+        Upload one detached chunk, then advance the partition's durable
+        position as far as every earlier upload allows.
+        """
+        start = time.perf_counter()
+        try:
+            await self.save_to_datalake(chunk.records, container_name, batch_id)
+        except BaseException:
+            # Keep the records buffered (also on cancellation) and their
+            # events uncheckpointed for the next attempt
+            buffer.restore(container, chunk)
+            raise
+        upload_seconds = time.perf_counter() - start
+
+        self.flush_stats.record(container.name, len(chunk.records), chunk.bytes, age, upload_seconds)
+        self.telemetry.observe_transactions("flush", chunk.records)
+        logging.info("Flushed %d %s transactions from partition %s: %d bytes, age %.2fs, upload %.3fs",
+                     len(chunk.records), container.name, buffer.partition_id, chunk.bytes, age, upload_seconds)
+
+        state = self.get_state(buffer.partition_id)
+        if state.dedup is not None:
+            state.dedup.commit(chunk.records)
+        if state.accounts is not None:
+            state.accounts.commit(chunk.records)
+
+        # Events become durable once every container has written their records
+        position = buffer.complete(container, chunk)
+        if position:
+            self.checkpointer.mark_durable({buffer.partition_id: position})
+
+    async def flush_all(self):
+        """
+        Flush every buffer and wait for all uploads to finish.
+        """
+        await self.process_batch()
+        await self.executor.drain()
+        unwritten = sum(len(buffer) for buffer in self.buffers.values())
+        if unwritten:
+            logging.warning("%d transactions could not be written and will be replayed "
+                            "from the last checkpoint", unwritten)
+
+    async def flush_due_buffers(self):
+        """
+        Flush buffers that reached their max age while their partition is
+        idle, checkpoint what became durable (with the state of each
+        partition) and reload changed rules. Runs until cancelled.
+        """
+        while True:
+            await asyncio.sleep(FLUSH_CHECK_INTERVAL)
+            self.reload_rules()
+            try:
+                await self.process_batch(due_only=True)
+                await self.checkpointer.maybe_checkpoint()
+            except Exception as e:
+                logging.error("Error flushing buffers: %s", e)
+            report = self.telemetry.maybe_report()
+            if report is not None:
+                logging.info("Consumer metrics: %s", json.dumps(report))
+            self.event_log.summary()
+
+    async def process_event_batch(self, partition_context, events):
+        """
+        Process a batch of events from one partition: classify the whole
+        batch in one pass, then flush whatever the flush policy says is due.
+        """
+        # Check if shutdown was requested
+        if self.shutdown_event.is_set():
+            self.event_log.event("skipped", "Shutdown requested, stopping event processing")
+            return
+
+        if not events:
+            return
+
+        try:
+            # Parse event data; compressed events expand into several transactions
+            payloads = [decode_event_payload(event) for event in events]
+            transactions = [event_data for event_transactions, _ in payloads for event_data in event_transactions]
+            record_size = sum(size for _, size in payloads) // max(len(transactions), 1)
+            partition_id = partition_context.partition_id
+            transactions = self.deduplicate(transactions, partition_id)
+            
+            # Classify and route the whole batch
+            normal, suspicious, fired = self.classify_batch(transactions, partition_id)
+            self.telemetry.observe_transactions("classify", transactions)
+            buffer = self.get_buffer(partition_id)
+            buffer.add(buffer.normal, normal, record_size * len(normal))
+            buffer.add(buffer.suspicious, suspicious, record_size * len(suspicious))
+            self.event_log.count("normal", len(normal))
+            for event_data, rules in zip(suspicious, fired):
+                self.event_log.event("suspicious", "Suspicious transaction detected: %s (rules: %s)",
+                                     event_data['transaction_id'], ', '.join(rules), sample_every=1,
+                                     partition_id=partition_id)
+            self.event_log.event("batch", "Processed %d transactions from partition %s (%d suspicious)",
+                                 len(transactions), partition_id, len(suspicious))
+            
+            buffer.track(partition_context, events[-1], len(events))
+            self.telemetry.record_processed(partition_context, events[-1])
+            self.health.record(partition_id, events[-1], len(events))
+            await self.process_batch(partition_id, due_only=True)
+            await self.checkpointer.maybe_checkpoint(partition_id=partition_id)
+            
+        except Exception as e:
+            logging.error("Error processing event batch: %s", e)
+            raise
+
+    async def process_event(self, partition_context, event):
+        """
+        Process each event from Event Hub and classify transactions.
+        """
+        # Check if shutdown was requested
+        if self.shutdown_event.is_set():
+            self.event_log.event("skipped", "Shutdown requested, stopping event processing")
+            return
+
+        try:
+            buffer = self.get_buffer(partition_context.partition_id)
+            
+            # Parse event data; compressed events expand into several transactions
+            transactions, size = decode_event_payload(event)
+            record_size = size // max(len(transactions), 1)
+            transactions = self.deduplicate(transactions, buffer.partition_id)
+            for event_data in transactions:
+                # Classify transaction
+                rules = self.detect(event_data, buffer.partition_id)
+                if rules:
+                    buffer.add(buffer.suspicious, [event_data], record_size)
+                    self.event_log.event("suspicious", "Suspicious transaction detected: %s (rules: %s)",
+                                         event_data['transaction_id'], ', '.join(rules), sample_every=1,
+                                         partition_id=buffer.partition_id)
+                else:
+                    buffer.add(buffer.normal, [event_data], record_size)
+                    self.event_log.event("normal", "Normal transaction processed: %s", event_data['transaction_id'],
+                                         partition_id=buffer.partition_id)
+            
+            self.telemetry.observe_transactions("classify", transactions)
+            buffer.track(partition_context, event)
+            self.telemetry.record_processed(partition_context, event)
+            self.health.record(buffer.partition_id, event)
+            
+            # Flush the containers whose record, size or age limit is reached
+            await self.process_batch(buffer.partition_id, due_only=True)
+            
+            # Checkpoint only what this partition has durably written, every N events or T seconds
+            await self.checkpointer.maybe_checkpoint(partition_id=buffer.partition_id)
+            
+        except Exception as e:
+            logging.error("Error processing event: %s", e)
+            raise
+
+    async def process_events(self, max_wait_time: Optional[float] = 60):
+        """
+        Receive and process events until shutdown is requested, or for at
+        most max_wait_time seconds (None: until shutdown). Partitions are
+        balanced across all consumers sharing the consumer group and
+        checkpoint store, so running more instances spreads the partitions.
+        """
+        # Set up shutdown handlers before processing
+        self.setup_shutdown_handler()
+
+        client = EventHubConsumerClient.from_connection_string(
+            conn_str=EVENT_HUB_CONNECTION_STR,
+            consumer_group=self.consumer_group,
+            eventhub_name=EVENT_HUB_NAME,
+            checkpoint_store=create_checkpoint_store(),
+            load_balancing_interval=LOAD_BALANCING_INTERVAL,
+        )
+
+        async with client:
+            # Flush aged buffers even while partitions are idle
+            flusher = asyncio.create_task(self.flush_due_buffers())
+            self.loop_monitor.start()
+            receiving = None
+            stopping = asyncio.ensure_future(self.shutdown_event.wait())
+            try:
+                # Process events until shutdown is requested or max_wait_time is reached
+                if RECEIVE_MODE == "batch":
+                    receiving = asyncio.ensure_future(client.receive_batch(
+                        on_event_batch=self.process_event_batch,
+                        on_partition_initialize=self.on_partition_initialize,
+                        on_partition_close=self.on_partition_close,
+                        max_batch_size=MAX_BATCH_SIZE,
+                        max_wait_time=MAX_BATCH_WAIT_TIME,
+                        track_last_enqueued_event_properties=True,
+                        starting_position="-1"  # Start from beginning
+                    ))
+                else:
+                    receiving = asyncio.ensure_future(client.receive(
+                        on_event=self.process_event,
+                        on_partition_initialize=self.on_partition_initialize,
+                        on_partition_close=self.on_partition_close,
+                        track_last_enqueued_event_properties=True,
+                        starting_position="-1"  # Start from beginning
+                    ))
+                self.health.receiving = True
+                done, _ = await asyncio.wait({receiving, stopping}, timeout=max_wait_time,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if receiving in done:
+                    receiving.result()
+                    logging.info("Receiving stopped")
+                elif stopping in done:
+                    logging.info("Shutdown requested")
+                else:
+                    logging.info("Max wait time reached")
+            except Exception as e:
+                logging.error("Error during event processing: %s", e)
+                raise
+            finally:
+                self.health.receiving = False
+                for task in (receiving, stopping, flusher):
+                    if task is not None:
+                        task.cancel()
+                await asyncio.gather(*(task for task in (receiving, stopping, flusher) if task is not None),
+                                     return_exceptions=True)
+
+                # Process any remaining transactions
+                await self.flush_all()
+                await self.checkpointer.maybe_checkpoint(force=True)
+                await self.save_state()
+                logging.info("Flush statistics: %s", self.flush_stats.report())
+                logging.info("Data Lake writer: %s", self.writer.report())
+                for partition_id, state in sorted(self.partitions.items()):
+                    if state.accounts is not None:
+                        logging.info("Account state of partition %s: %s", partition_id, state.accounts.report())
+                    if state.dedup is not None:
+                        logging.info("Dedup of partition %s: %s", partition_id, state.dedup.report())
+                await self.loop_monitor.stop()
+                logging.info("Event loop lag: %s", self.loop_monitor.report())
+                logging.info("Consumer metrics: %s", json.dumps(self.telemetry.report()))
+                self.event_log.summary(force=True)
+                self.writer.close()
+                logging.info("Finished processing all transactions")
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from consumer_core import CONSUMER_GROUP, EVENT_HUB_NAME, TransactionProcessor
+from event_log import configure_logging
+from health_server import HealthServer
+
+# Health and metrics endpoint
+HEALTH_HOST = os.getenv("CONSUMER_HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("CONSUMER_HEALTH_PORT", 8080))
+# Delay before reconnecting after the consumer stopped on an error, doubled up to the maximum
+RESTART_DELAY_SECONDS = float(os.getenv("CONSUMER_RESTART_DELAY_SECONDS", 5))
+MAX_RESTART_DELAY_SECONDS = float(os.getenv("CONSUMER_MAX_RESTART_DELAY_SECONDS", 300))
+
+class ConsumerService:
+    """
+    Long-running consumer: keeps one TransactionProcessor connected until
+    shutdown (SIGTERM/SIGINT), reconnecting with backoff if it fails.
+
+    Each instance claims a share of the partitions through the checkpoint
+    store's ownership records, so the consumer scales out by running more
+    instances (up to one per partition), and the timer function only
+    consumes while no instance is running.
+    """
+
+    def __init__(self):
+        self.shutdown_event = asyncio.Event()
+        self.processor: Optional[TransactionProcessor] = None
+        self.restarts = 0
+        self.health_server = HealthServer(self.is_healthy, self.status, self.metrics, HEALTH_HOST, HEALTH_PORT)
+
+    def is_healthy(self) -> bool:
+        return self.processor is not None and self.processor.is_healthy()
+
+    def status(self) -> Dict:
+        status = {"event_hub": EVENT_HUB_NAME, "consumer_group": CONSUMER_GROUP, "restarts": self.restarts}
+        if self.processor is not None:
+            status.update(self.processor.metrics())
+        return status
+
+    def metrics(self) -> str:
+        """Prometheus metrics: service gauges, then the processor's lag and latency."""
+        owned = len(self.processor.health.owned) if self.processor is not None else 0
+        lines = ["# TYPE eagle_consumer_up gauge", f"eagle_consumer_up {int(self.is_healthy())}",
+                 "# TYPE eagle_consumer_restarts_total counter", f"eagle_consumer_restarts_total {self.restarts}",
+                 "# TYPE eagle_consumer_owned_partitions gauge", f"eagle_consumer_owned_partitions {owned}"]
+        text = "\n".join(lines) + "\n"
+        if self.processor is not None:
+            text += self.processor.telemetry.prometheus_text()
+        return text
+
+    async def run(self):
+        await self.health_server.start()
+        delay = RESTART_DELAY_SECONDS
+        try:
+            while not self.shutdown_event.is_set():
+                self.processor = TransactionProcessor(shutdown_event=self.shutdown_event)
+                failed = False
+                try:
+                    await self.processor.process_events(max_wait_time=None)
+                except Exception as e:
+                    logging.error("Consumer stopped: %s", e)
+                    failed = True
+                if self.shutdown_event.is_set():
+                    break
+                self.restarts += 1
+                logging.info("Reconnecting in %.0fs", delay)
+                try:
+                    await asyncio.wait_for(self.shutdown_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, MAX_RESTART_DELAY_SECONDS) if failed else RESTART_DELAY_SECONDS
+        finally:
+            await self.health_server.stop()
+        logging.info("Consumer service stopped")
+
+def main():
+    # Log through a queue so writing to stdout never blocks the event loop
+    configure_logging()
+    asyncio.run(ConsumerService().run())
+
+if __name__ == "__main__":
+    main()
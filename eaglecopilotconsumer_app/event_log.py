@@ -0,0 +1,166 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+# Records waiting for the writer thread; beyond this they are dropped rather than block the loop
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Per-event logs: one in LOG_SAMPLE_EVERY is written, at most LOG_MAX_PER_SECOND per second
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 1000))
+LOG_MAX_PER_SECOND = float(os.getenv("LOG_MAX_PER_SECOND", 50))
+# How often the per-event counts are logged as a summary
+LOG_SUMMARY_SECONDS = float(os.getenv("LOG_SUMMARY_SECONDS", 60))
+
+# LogRecord attributes that are not structured fields
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+def record_fields(record: logging.LogRecord) -> Dict:
+    """Structured fields passed with extra={...}."""
+    return {key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the record's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The usual text line, followed by the record's fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them, and drops
+    them (counting) when the queue is full instead of blocking the caller.
+    Arguments must not be mutated after the call, as they are formatted later.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT,
+                      queue_size: int = LOG_QUEUE_SIZE) -> QueueListener:
+    """
+    Route the root logger through a queue to a writer thread, so formatting
+    and stdout I/O never run on the event loop. For standalone processes;
+    the Azure Functions host installs its own handlers.
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    log_queue: queue.Queue = queue.Queue(queue_size)
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    root = logging.getLogger()
+    root.handlers[:] = [DroppingQueueHandler(log_queue)]
+    root.setLevel(level)
+    atexit.register(listener.stop)
+    return listener
+
+class EventLog:
+    """
+    Logging for hot paths. Every event is counted by kind, but only one in
+    sample_every is logged, with at most max_per_second lines per second
+    per kind, so sampled routine lines never use up the budget of rare
+    ones such as suspicious detections; messages use lazy %-style
+    arguments, so suppressed events are never formatted. summary() logs the
+    counts per kind per interval.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_every: int = LOG_SAMPLE_EVERY,
+                 max_per_second: float = LOG_MAX_PER_SECOND, summary_seconds: float = LOG_SUMMARY_SECONDS):
+        self.logger = logger
+        self.sample_every = max(1, sample_every)
+        self.max_per_second = max_per_second
+        self.summary_seconds = summary_seconds
+        self.counts: Dict[str, int] = {}
+        self.interval_counts: Dict[str, int] = {}
+        self.suppressed = 0
+        # kind -> [tokens, refilled at]
+        self.buckets: Dict[str, List[float]] = {}
+        self.summarized_at = time.monotonic()
+
+    def _allow(self, kind: str) -> bool:
+        """Token bucket of max_per_second lines for each kind."""
+        now = time.monotonic()
+        bucket = self.buckets.get(kind)
+        if bucket is None:
+            bucket = self.buckets[kind] = [self.max_per_second, now]
+        bucket[0] = min(self.max_per_second, bucket[0] + (now - bucket[1]) * self.max_per_second)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def count(self, kind: str, n: int = 1) -> int:
+        """Count n events of kind without logging them; returns the running total."""
+        count = self.counts.get(kind, 0) + n
+        self.counts[kind] = count
+        self.interval_counts[kind] = self.interval_counts.get(kind, 0) + n
+        return count
+
+    def event(self, kind: str, msg: str, *args, level: int = logging.INFO,
+              sample_every: Optional[int] = None, **fields):
+        """
+        Count an event of kind and log it if sampled and within the rate
+        limit of its kind. sample_every=1 logs every event (still rate
+        limited); fields are passed to the formatter as structured fields.
+        """
+        count = self.count(kind)
+        if (count - 1) % (sample_every or self.sample_every) or not self.logger.isEnabledFor(level):
+            return
+        if not self._allow(kind):
+            self.suppressed += 1
+            return
+        self.logger.log(level, msg, *args, extra=dict(fields, kind=kind, count=count))
+
+    def summary(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """Log and reset the counts of the interval, once every summary_seconds (or now if force)."""
+        now = time.monotonic()
+        if not force and now - self.summarized_at < self.summary_seconds:
+            return None
+        counts, self.interval_counts = self.interval_counts, {}
+        interval, self.summarized_at = now - self.summarized_at, now
+        # Records the queue handler had to drop (see configure_logging)
+        dropped = sum(getattr(handler, "dropped", 0) for handler in logging.getLogger().handlers)
+        if counts or self.suppressed:
+            self.logger.info("Event summary over %.0fs: %s (%d lines rate limited, %d dropped)", interval,
+                             counts, self.suppressed, dropped,
+                             extra={"counts": counts, "rate_limited": self.suppressed, "queue_dropped": dropped})
+        self.suppressed = 0
+        return counts
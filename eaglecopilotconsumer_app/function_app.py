@@ -1,251 +1,45 @@
 import logging
-import asyncio
-import json
 import os
-import signal
-import sys
-from datetime import datetime
-import pandas as pd
-from typing import Dict, List
 import azure.functions as func
-from azure.eventhub.aio import EventHubConsumerClient
-from azure.eventhub.extensions.checkpointstoreblobaio import BlobCheckpointStore
-from azure.storage.filedatalake.aio import DataLakeServiceClient
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from consumer_core import TransactionProcessor, service_is_active
 
-# Azure Event Hub Configuration
-EVENT_HUB_CONNECTION_STR = os.getenv("EVENT_HUB_CONNECTION_STR")
-EVENT_HUB_NAME = os.getenv("EVENT_HUB_NAME")
-
-# Azure Storage Configuration
-STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
-STORAGE_SAS_TOKEN = os.getenv("AZURE_SAS_TOKEN")
-CHECKPOINT_CONTAINER = os.getenv("CHECKPOINT_CONTAINER", "checkpoints")
-NORMAL_CONTAINER = os.getenv("NORMAL_CONTAINER", "normal-transactions")
-SUSPICIOUS_CONTAINER = os.getenv("SUSPICIOUS_CONTAINER", "suspicious-transactions")
-
-# Construct the storage account URL
-STORAGE_URL = f"https://{STORAGE_ACCOUNT_NAME}.dfs.core.windows.net"
-
-# Transaction monitoring thresholds
-HIGH_AMOUNT_THRESHOLD = float(os.getenv("HIGH_AMOUNT_THRESHOLD", 1000000))  # $1M USD
-SANCTIONED_COUNTRIES = ["PRK", "IRN", "SYR", "CUB"]  # Sanctioned countries list
-
-class TransactionProcessor:
-    def __init__(self):
-        self.normal_transactions = []
-        self.suspicious_transactions = []
-        self.shutdown_event = asyncio.Event()
-        
-        # Initialize DataLake client with SAS token
-        self.datalake_service_client = DataLakeServiceClient(
-            account_url=STORAGE_URL,
-            credential=STORAGE_SAS_TOKEN
-        )
-
-    def setup_shutdown_handler(self):
-        """
-        Set up platform-independent shutdown handling
-        """
-        if sys.platform != 'win32':
-            # Unix-like systems
-            loop = asyncio.get_event_loop()
-            for sig in (signal.SIGTERM, signal.SIGINT):
-                loop.add_signal_handler(sig, self._signal_handler)
-        else:
-            # Windows systems
-            signal.signal(signal.SIGINT, self._win_signal_handler)
-            signal.signal(signal.SIGTERM, self._win_signal_handler)
-
-    def _signal_handler(self):
-        """
-        Signal handler for Unix-like systems
-        """
-        logging.info("Shutdown signal received. Starting graceful shutdown...")
-        self.shutdown_event.set()
-
-    def _win_signal_handler(self, signum, frame):
-        """
-        Signal handler for Windows systems
-        """
-        logging.info("Shutdown signal received. Starting graceful shutdown...")
-        self.shutdown_event.set()
-        
-    def is_suspicious(self, transaction: Dict) -> bool:
-        """
-        Determine if a transaction is suspicious based on defined criteria.
-        """
-        # Check for high amount
-        amount_suspicious = transaction.get('amount_usd', 0) >= HIGH_AMOUNT_THRESHOLD
-        
-        # Check for sanctioned countries
-        sender_country = transaction.get('sender_country')
-        receiver_country = transaction.get('receiver_country')
-        country_suspicious = (sender_country in SANCTIONED_COUNTRIES or 
-                            receiver_country in SANCTIONED_COUNTRIES)
-        
-        return amount_suspicious or country_suspicious
-
-    async def save_to_datalake(self, transactions: List[Dict], container_name: str, batch_id: str):
-        """
-        Save transactions to Azure Data Lake Storage as CSV file.
-        """
-        if not transactions:
-            return
-
-        # Convert transactions to DataFrame
-        df = pd.DataFrame(transactions)
-        
-        # Create CSV content
-        csv_content = df.to_csv(index=False).encode('utf-8')
-        
-        # Generate file path with year/month/day folder structure and unique timestamp
-        now = datetime.now()
-        file_path = f"{now.year}/{now.month:02d}/{now.day:02d}/transactions_{batch_id}_{now.microsecond}.csv"
-        
-        try:
-            # Get container client
-            container_client = self.datalake_service_client.get_file_system_client(container_name)
-            
-            # Create directory structure if it doesn't exist
-            directory_path = f"{now.year}/{now.month:02d}/{now.day:02d}"
-            directory_client = container_client.get_directory_client(directory_path)
-            await directory_client.create_directory()
-            
-            # Create file client
-            file_client = container_client.get_file_client(file_path)
-            
-            # Upload data without checking previous conditions
-            await file_client.upload_data(csv_content, overwrite=True, raw_response_hook=None)
-            
-            logging.info(f"Saved {len(transactions)} transactions to {container_name}/{file_path}")
-        
-        except Exception as e:
-            logging.error(f"Error saving to Data Lake: {str(e)}")
-            # Log additional details for debugging
-            logging.error(f"Container: {container_name}, Path: {file_path}")
-            raise
-
-    async def process_batch(self):
-        """
-        Process accumulated transactions and save to appropriate containers.
-        """
-        if self.normal_transactions or self.suspicious_transactions:
-            batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Save normal transactions
-            if self.normal_transactions:
-                await self.save_to_datalake(
-                    self.normal_transactions,
-                    NORMAL_CONTAINER,
-                    batch_id
-                )
-                self.normal_transactions = []
-            
-            # Save suspicious transactions
-            if self.suspicious_transactions:
-                await self.save_to_datalake(
-                    self.suspicious_transactions,
-                    SUSPICIOUS_CONTAINER,
-                    batch_id
-                )
-                self.suspicious_transactions = []
-
-    async def process_events(self, max_wait_time: int = 60):
-        """
-        Process events from Event Hub with a maximum wait time.
-        """
-        # Set up shutdown handlers before processing
-        self.setup_shutdown_handler()
-
-        checkpoint_store = BlobCheckpointStore(
-            blob_account_url=f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net",
-            container_name=CHECKPOINT_CONTAINER,
-            credential=STORAGE_SAS_TOKEN
-        )
-        
-        client = EventHubConsumerClient.from_connection_string(
-            conn_str=EVENT_HUB_CONNECTION_STR,
-            consumer_group="preview_data_consumer_group",
-            eventhub_name=EVENT_HUB_NAME,
-            checkpoint_store=checkpoint_store,
-        )
-
-        async def process_event(partition_context, event):
-            # Check if shutdown was requested
-            if self.shutdown_event.is_set():
-                logging.info("Shutdown requested, stopping event processing")
-                return
-
-            try:
-                # Parse event data
-                event_data = json.loads(event.body_as_str(encoding='UTF-8'))
-                
-                # Classify transaction
-                if self.is_suspicious(event_data):
-                    self.suspicious_transactions.append(event_data)
-                    logging.info(f"Suspicious transaction detected: {event_data['transaction_id']}")
-                else:
-                    self.normal_transactions.append(event_data)
-                    logging.info(f"Normal transaction processed: {event_data['transaction_id']}")
-                
-                # Process batch if we have accumulated enough transactions
-                if len(self.normal_transactions) >= 10 or len(self.suspicious_transactions) >= 1:
-                    await self.process_batch()
-                
-                # Update checkpoint
-                await partition_context.update_checkpoint(event)
-                
-            except Exception as e:
-                logging.error(f"Error processing event: {str(e)}")
-                raise
-
-        async with client:
-            try:
-                # Process events until shutdown is requested or max_wait_time is reached
-                await asyncio.wait_for(
-                    client.receive(
-                        on_event=process_event,
-                        starting_position="-1"  # Start from beginning
-                    ),
-                    timeout=max_wait_time,
-                )
-            except asyncio.TimeoutError:
-                logging.info("Max wait time reached")
-            except Exception as e:
-                logging.error(f"Error during event processing: {str(e)}")
-                raise
-            finally:
-                # Process any remaining transactions
-                await self.process_batch()
-                logging.info("Finished processing all transactions")
+# The long-running consumer service (consumer_service.py) is the primary consumer;
+# the timer runs a cycle only when no consumer owns the partitions
+TIMER_MODE = os.getenv("CONSUMER_TIMER_MODE", "fallback")  # fallback | always | off
+TIMER_RECEIVE_SECONDS = float(os.getenv("CONSUMER_TIMER_RECEIVE_SECONDS", 240))
 
 app = func.FunctionApp()
 
 @app.timer_trigger(schedule="0 */5 * * * *", arg_name="myTimer", run_on_startup=False,
-              use_monitor=False) 
+              use_monitor=False)
 async def consumereagle_timer(myTimer: func.TimerRequest) -> None:
     """
-    Azure Function timer trigger that runs every 5 minutes to process transactions.
+    Azure Function timer trigger that runs every 5 minutes to process
+    transactions, as a fallback for the consumer service.
     """
     if myTimer.past_due:
         logging.info('The timer is past due!')
 
+    if TIMER_MODE == "off":
+        logging.info('Timer consumer disabled')
+        return
+    if TIMER_MODE == "fallback" and await service_is_active():
+        logging.info('Consumer service owns the partitions, skipping cycle')
+        return
+
     logging.info('Starting transaction processing cycle')
-    
+
     try:
         # Initialize processor
         processor = TransactionProcessor()
-        
+
         # Process events for 4 minutes (240 seconds)
         # This gives 1-minute buffer before the next trigger
-        await processor.process_events(max_wait_time=240)
-        
+        await processor.process_events(max_wait_time=TIMER_RECEIVE_SECONDS)
+
         logging.info('Transaction processing cycle completed successfully')
-        
+
     except Exception as e:
-        logging.error(f'Error in transaction processing cycle: {str(e)}')
-        raise
\ No newline at end of file
+        logging.error('Error in transaction processing cycle: %s', e)
+        raise
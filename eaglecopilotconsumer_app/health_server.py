@@ -0,0 +1,67 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+JSON_CONTENT_TYPE = "application/json"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+class HealthServer:
+    """
+    Minimal HTTP endpoint for the long-running consumer, on the event loop
+    it runs on: GET /health answers 200 while the consumer is healthy and
+    503 otherwise, GET /metrics returns its metrics in the Prometheus text
+    format and GET /status as JSON.
+    """
+
+    def __init__(self, healthy: Callable[[], bool], status: Callable[[], Dict], metrics: Callable[[], str],
+                 host: str = "0.0.0.0", port: int = 8080):
+        self.healthy = healthy
+        self.status = status
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logging.info("Health endpoint listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def respond(self, path: str) -> Tuple[int, str, bytes]:
+        """Status code, content type and body for a request path."""
+        if path == "/health":
+            healthy = self.healthy()
+            body = {"status": "ok" if healthy else "unavailable"}
+            return (200 if healthy else 503), JSON_CONTENT_TYPE, json.dumps(body).encode("utf-8")
+        if path == "/status":
+            return 200, JSON_CONTENT_TYPE, json.dumps(self.status(), default=str).encode("utf-8")
+        if path == "/metrics":
+            return 200, PROMETHEUS_CONTENT_TYPE, self.metrics().encode("utf-8")
+        return 404, JSON_CONTENT_TYPE, json.dumps({"error": f"Not found: {path}"}).encode("utf-8")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Skip the headers; requests have no body
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+            try:
+                status, content_type, content = self.respond(path)
+            except Exception as e:
+                status, content_type, content = 500, JSON_CONTENT_TYPE, json.dumps({"error": str(e)}).encode("utf-8")
+            reason = {200: "OK", 404: "Not Found", 500: "Internal Server Error", 503: "Service Unavailable"}[status]
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(content)}\r\nConnection: close\r\n\r\n".encode("latin-1") + content)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,187 @@
+import bisect
+import os
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from transaction_codec import timestamp_seconds
+
+# Percentiles cover a sliding window made of LATENCY_WINDOW_SLOTS slots
+LATENCY_WINDOW_SECONDS = float(os.getenv("LATENCY_WINDOW_SECONDS", 300))
+LATENCY_WINDOW_SLOTS = int(os.getenv("LATENCY_WINDOW_SLOTS", 10))
+# How often the consumers log a structured metrics line (0 disables)
+METRICS_LOG_SECONDS = float(os.getenv("METRICS_LOG_SECONDS", 60))
+
+# Histogram bucket upper bounds in seconds, roughly log-spaced from 1 ms to 1 hour
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+# Producer timestamp -> classified, -> written to the Data Lake; enqueue time -> checkpointed
+STAGES = ("classify", "flush", "checkpoint")
+QUANTILES = (0.5, 0.9, 0.99)
+
+def producer_time(transaction: Dict) -> Optional[float]:
+    """Producer timestamp as epoch seconds (the producers write naive UTC), or None."""
+    return timestamp_seconds(transaction.get("timestamp"))
+
+class SlidingHistogram:
+    """
+    Latency histogram over fixed buckets. Cumulative counts feed the
+    Prometheus histogram; per-slot counts give percentiles over the last
+    window seconds. Observing costs one bisect, memory is fixed.
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS, window: float = LATENCY_WINDOW_SECONDS,
+                 slots: int = LATENCY_WINDOW_SLOTS):
+        self.buckets = tuple(buckets)
+        self.slot_seconds = window / slots
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        # [slot index, bucket counts, min, max] for the slots of the window
+        self.slots: deque = deque(maxlen=slots)
+
+    def _slot(self, now: float) -> List:
+        index = int(now // self.slot_seconds)
+        if not self.slots or self.slots[-1][0] != index:
+            self.slots.append([index, [0] * len(self.counts), float("inf"), 0.0])
+        return self.slots[-1]
+
+    def observe(self, value: float, now: Optional[float] = None):
+        bucket = bisect.bisect_left(self.buckets, value)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.sum += value
+        slot = self._slot(now or time.time())
+        slot[1][bucket] += 1
+        if value < slot[2]:
+            slot[2] = value
+        if value > slot[3]:
+            slot[3] = value
+
+    def window(self, now: Optional[float] = None):
+        """Bucket counts, total, minimum and maximum over the sliding window."""
+        oldest = int((now or time.time()) // self.slot_seconds) - self.slots.maxlen
+        counts = [0] * len(self.counts)
+        minimum, maximum = float("inf"), 0.0
+        for index, slot_counts, slot_min, slot_max in self.slots:
+            if index > oldest:
+                counts = [total + count for total, count in zip(counts, slot_counts)]
+                minimum, maximum = min(minimum, slot_min), max(maximum, slot_max)
+        return counts, sum(counts), minimum, maximum
+
+    def percentile(self, quantile: float, now: Optional[float] = None) -> Optional[float]:
+        """
+        Quantile over the window, interpolated within its bucket (narrowed
+        to the window's minimum and maximum); None without samples.
+        """
+        counts, total, minimum, maximum = self.window(now)
+        if not total:
+            return None
+        rank = quantile * total
+        seen = 0
+        for bucket, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = max(minimum, self.buckets[bucket - 1] if bucket else 0.0)
+                upper = min(maximum, self.buckets[bucket] if bucket < len(self.buckets) else maximum)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return maximum
+
+    def report(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Window percentiles in seconds, for log lines."""
+        now = now or time.time()
+        _, total, _, maximum = self.window(now)
+        report = {"count": total}
+        if total:
+            for quantile in QUANTILES:
+                report[f"p{int(quantile * 100)}"] = round(self.percentile(quantile, now), 4)
+            report["max"] = round(maximum, 4)
+        return report
+
+class ConsumerMetrics:
+    """
+    Consumer lag and end-to-end latency.
+
+    Lag compares, per partition, the last event processed with the last
+    event enqueued, which the receive calls track with
+    track_last_enqueued_event_properties. Latency histograms measure the
+    producer's transaction timestamp to classification and to the Data
+    Lake write, and the Event Hub enqueue time to the checkpoint (a
+    checkpoint only knows its event, not the transactions in it).
+    """
+
+    def __init__(self, log_seconds: float = METRICS_LOG_SECONDS):
+        self.latency = {stage: SlidingHistogram() for stage in STAGES}
+        self.partitions: Dict[str, Dict[str, float]] = {}
+        self.log_seconds = log_seconds
+        self.logged_at = time.monotonic()
+
+    def record_processed(self, partition_context, event):
+        """Note the last event processed from a partition and how far it trails the partition's end."""
+        lag = self.partitions.setdefault(partition_context.partition_id, {})
+        lag["processed_sequence_number"] = event.sequence_number
+        last_enqueued = getattr(partition_context, "last_enqueued_event_properties", None) or {}
+        if last_enqueued.get("sequence_number") is not None:
+            lag["enqueued_sequence_number"] = last_enqueued["sequence_number"]
+            lag["lag_events"] = max(0, last_enqueued["sequence_number"] - event.sequence_number)
+        if last_enqueued.get("enqueued_time") is not None and event.enqueued_time is not None:
+            lag["lag_seconds"] = max(0.0, (last_enqueued["enqueued_time"] - event.enqueued_time).total_seconds())
+
+    def observe_transactions(self, stage: str, transactions: Iterable[Dict]):
+        """Latency from each transaction's producer timestamp to now."""
+        now = time.time()
+        histogram = self.latency[stage]
+        for transaction in transactions:
+            produced = producer_time(transaction)
+            if produced is not None:
+                histogram.observe(max(0.0, now - produced), now)
+
+    def observe_checkpoint(self, event):
+        if event.enqueued_time is not None:
+            now = time.time()
+            self.latency["checkpoint"].observe(max(0.0, now - event.enqueued_time.timestamp()), now)
+
+    def report(self) -> Dict:
+        now = time.time()
+        return {
+            "lag": {partition_id: dict(lag) for partition_id, lag in sorted(self.partitions.items())},
+            "latency_seconds": {stage: histogram.report(now) for stage, histogram in self.latency.items()},
+        }
+
+    def maybe_report(self) -> Optional[Dict]:
+        """The report, once every log_seconds; None when not due or disabled."""
+        if not self.log_seconds or time.monotonic() - self.logged_at < self.log_seconds:
+            return None
+        self.logged_at = time.monotonic()
+        return self.report()
+
+    def prometheus_text(self, prefix: str = "eagle_consumer") -> str:
+        """Lag gauges, latency histograms and window quantiles in the Prometheus text format."""
+        now = time.time()
+        lines = [f"# HELP {prefix}_latency_seconds Transaction latency by pipeline stage.",
+                 f"# TYPE {prefix}_latency_seconds histogram"]
+        for stage, histogram in self.latency.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_latency_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_latency_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{prefix}_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines += [f"# HELP {prefix}_latency_window_seconds Latency quantiles over the sliding window.",
+                  f"# TYPE {prefix}_latency_window_seconds gauge"]
+        for stage, histogram in self.latency.items():
+            for quantile in QUANTILES:
+                value = histogram.percentile(quantile, now)
+                if value is not None:
+                    lines.append(f'{prefix}_latency_window_seconds{{stage="{stage}",quantile="{quantile}"}} {value}')
+        for name, help_text in (("lag_events", "Events enqueued but not yet processed."),
+                                ("lag_seconds", "Enqueue time of the last enqueued event minus that of the last processed one."),
+                                ("processed_sequence_number", "Sequence number of the last processed event."),
+                                ("enqueued_sequence_number", "Sequence number of the last enqueued event.")):
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} gauge"]
+            for partition_id, lag in sorted(self.partitions.items()):
+                if name in lag:
+                    lines.append(f'{prefix}_{name}{{partition="{partition_id}"}} {lag[name]}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rules file; without it the built-in rules below apply
+RULES_PATH = os.getenv("TRANSACTION_RULES_PATH",
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), "transaction_rules.json"))
+# How often the rules file is checked for changes
+RULES_RELOAD_SECONDS = float(os.getenv("RULES_RELOAD_SECONDS", 30))
+
+# Built-in rules, used when no rules file exists. When set, HIGH_AMOUNT_THRESHOLD
+# also overrides the threshold of the rules file's high_amount rule.
+HIGH_AMOUNT_THRESHOLD_SETTING = os.getenv("HIGH_AMOUNT_THRESHOLD")
+HIGH_AMOUNT_THRESHOLD = float(HIGH_AMOUNT_THRESHOLD_SETTING or 1000000)  # $1M USD
+SANCTIONED_COUNTRIES = ["PRK", "IRN", "SYR", "CUB"]  # Sanctioned countries list
+DEFAULT_RULES = [
+    {"name": "high_amount", "type": "amount_at_least", "threshold": HIGH_AMOUNT_THRESHOLD},
+    {"name": "sanctioned_country", "type": "value_in",
+     "fields": ["sender_country", "receiver_country"], "values": SANCTIONED_COUNTRIES},
+]
+
+class BatchColumns:
+    """
+    Field values of a batch, extracted once per field and shared by every
+    rule reading that field. Nested fields use dotted paths ("metadata.channel").
+    """
+
+    def __init__(self, transactions: List[Dict]):
+        self.transactions = transactions
+        self.columns: Dict[str, List] = {}
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def get(self, field: str) -> List:
+        values = self.columns.get(field)
+        if values is None:
+            parent, _, key = field.partition(".")
+            if key:
+                values = [(transaction.get(parent) or {}).get(key) for transaction in self.transactions]
+            else:
+                values = [transaction.get(field) for transaction in self.transactions]
+            self.columns[field] = values
+        return values
+
+# A compiled rule: batch columns -> one flag per transaction
+Predicate = Callable[[BatchColumns], List[bool]]
+
+def _fields(rule: Dict) -> List[str]:
+    fields = rule.get("fields") or [rule["field"]]
+    return [fields] if isinstance(fields, str) else list(fields)
+
+def _any_field(columns: BatchColumns, fields: List[str], test: Callable) -> List[bool]:
+    flags = [False] * len(columns)
+    for field in fields:
+        flags = [flag or test(value) for flag, value in zip(flags, columns.get(field))]
+    return flags
+
+def _compile_amount_at_least(rule: Dict) -> Predicate:
+    field = rule.get("field", "amount_usd")
+    threshold = float(rule.get("threshold", HIGH_AMOUNT_THRESHOLD))
+    return lambda columns: [value is not None and value >= threshold for value in columns.get(field)]
+
+def _compile_value_in(rule: Dict) -> Predicate:
+    fields = _fields(rule)
+    values = frozenset(rule["values"])
+    return lambda columns: _any_field(columns, fields, values.__contains__)
+
+def _compile_prefix(rule: Dict) -> Predicate:
+    fields = _fields(rule)
+    prefixes = tuple(rule["prefixes"])
+
+    def test(value) -> bool:
+        return isinstance(value, str) and value.startswith(prefixes)
+
+    return lambda columns: _any_field(columns, fields, test)
+
+def _compile_corridor_limit(rule: Dict) -> Predicate:
+    # Limits keyed "SENDER-RECEIVER" country codes; corridors without a limit use default
+    limits = {tuple(corridor.split("-", 1)): float(limit) for corridor, limit in rule["limits"].items()}
+    default = float(rule["default"]) if rule.get("default") is not None else float("inf")
+    amount_field = rule.get("field", "amount_usd")
+
+    def predicate(columns: BatchColumns) -> List[bool]:
+        return [amount is not None and amount >= limits.get((sender, receiver), default)
+                for amount, sender, receiver in zip(columns.get(amount_field), columns.get("sender_country"),
+                                                    columns.get("receiver_country"))]
+
+    return predicate
+
+RULE_TYPES: Dict[str, Callable[[Dict], Predicate]] = {
+    "amount_at_least": _compile_amount_at_least,
+    "value_in": _compile_value_in,
+    "prefix": _compile_prefix,
+    "corridor_limit": _compile_corridor_limit,
+}
+
+def compile_rules(rules: List[Dict]) -> List[Tuple[str, Predicate]]:
+    """Compile rule definitions into (name, predicate); disabled rules are skipped."""
+    compiled = []
+    for index, rule in enumerate(rules):
+        if not rule.get("enabled", True):
+            continue
+        name = rule.get("name") or f"rule_{index}"
+        compiler = RULE_TYPES.get(rule.get("type"))
+        if compiler is None:
+            raise ValueError(f"Rule {name}: unknown type {rule.get('type')!r}")
+        try:
+            compiled.append((name, compiler(rule)))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Rule {name}: invalid definition ({e!r})")
+    return compiled
+
+def load_rules(path: str) -> List[Dict]:
+    """Rule definitions from a JSON file: {"rules": [...]}."""
+    with open(path, encoding="utf-8") as rules_file:
+        try:
+            return json.load(rules_file)["rules"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid rules file {path}: {e!r}")
+
+def apply_settings(rules: List[Dict]) -> List[Dict]:
+    """
+    Give an explicitly set HIGH_AMOUNT_THRESHOLD precedence over the
+    high_amount rule's threshold in the file, warning when they disagree.
+    """
+    if HIGH_AMOUNT_THRESHOLD_SETTING is None:
+        return rules
+    for rule in rules:
+        if rule.get("name") != "high_amount" or rule.get("type") != "amount_at_least":
+            continue
+        threshold = rule.get("threshold")
+        if threshold is not None and float(threshold) != HIGH_AMOUNT_THRESHOLD:
+            logging.warning("HIGH_AMOUNT_THRESHOLD=%s overrides the high_amount threshold %s of the rules file",
+                            HIGH_AMOUNT_THRESHOLD_SETTING, threshold)
+        rule["threshold"] = HIGH_AMOUNT_THRESHOLD
+    return rules
+
+class RuleEngine:
+    """
+    Suspicious transaction rules, compiled once into batch predicates.
+
+    Rules come from a JSON file (see transaction_rules.json) and are
+    reloaded when the file changes, so thresholds and country lists can be
+    updated without restarting the consumer. A file that fails to load
+    leaves the previous rules in place. An amount_at_least rule without a
+    threshold uses HIGH_AMOUNT_THRESHOLD (see apply_settings).
+    """
+
+    def __init__(self, path: Optional[str] = RULES_PATH, reload_seconds: float = RULES_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.mtime: Optional[float] = None
+        self.checked_at = 0.0
+        self.rules = compile_rules(DEFAULT_RULES)
+        self.source = "built-in"
+        self.maybe_reload(force=True)
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        """
+        Reload the rules file if it changed since the last load (checked at
+        most every reload_seconds). Returns whether new rules were loaded;
+        raises ValueError, keeping the current rules, if the file is invalid.
+        """
+        now = time.monotonic()
+        if not self.path or (not force and now - self.checked_at < self.reload_seconds):
+            return False
+        self.checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        # Remember the version even if it is invalid, so it is reported once
+        self.mtime = mtime
+        self.rules = compile_rules(apply_settings(load_rules(self.path)))
+        self.source = self.path
+        return True
+
+    def evaluate_batch(self, transactions: List[Dict]) -> List[List[str]]:
+        """Names of the rules each transaction fired (empty for normal ones)."""
+        columns = BatchColumns(transactions)
+        fired: List[List[str]] = [[] for _ in transactions]
+        for name, predicate in self.rules:
+            for matches, flag in zip(fired, predicate(columns)):
+                if flag:
+                    matches.append(name)
+        return fired
+
+    def evaluate(self, transaction: Dict) -> List[str]:
+        """Names of the rules a single transaction fired."""
+        return self.evaluate_batch([transaction])[0]
@@ -0,0 +1,412 @@
+import gzip
+import json
+import math
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import msgspec
+except ImportError:  # Optional fast path
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # Optional fast path
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Optional compression
+    zstandard = None
+
+# Codec selection: auto picks the fastest available (msgspec > orjson > json)
+TRANSACTION_CODEC = os.getenv("TRANSACTION_CODEC", "auto")  # auto | msgspec | orjson | json
+
+# Wire format of produced events; consumers detect it from the event content type
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "json")  # json | msgpack
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/vnd.eagle.transaction+msgpack"
+
+# Grouped events carry many transactions: NDJSON for JSON, "group=1" for msgpack.
+# Compressed bodies are tagged with the algorithm in this event property.
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+CONTENT_ENCODING_PROPERTY = "content_encoding"
+
+Body = Union[bytes, bytearray, memoryview, str]
+
+# Positional layouts of the binary transaction record, by schema version.
+# Field order is part of the wire contract: append new fields in a new
+# version instead of reordering an existing one.
+PARTY_FIELDS_V1 = ["name", "address", "account_number", "bank_name", "swift_code"]
+METADATA_FIELDS_V1 = ["ip_address", "device_id", "user_agent", "channel"]
+TRANSACTION_SCHEMAS = {
+    1: [
+        "transaction_id",
+        "timestamp",
+        ("sender", PARTY_FIELDS_V1),
+        ("receiver", PARTY_FIELDS_V1),
+        "amount_usd",
+        "sender_country",
+        "receiver_country",
+        "transaction_type",
+        "status",
+        "fee_usd",
+        "reference",
+        ("metadata", METADATA_FIELDS_V1),
+    ],
+}
+SCHEMA_VERSION = max(TRANSACTION_SCHEMAS)
+
+def parse_amount(value) -> Optional[float]:
+    """A number or numeric string as a float; None otherwise."""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) else None
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """An ISO timestamp as naive UTC (offsets are converted); None if it does not parse."""
+    if not isinstance(value, str):
+        return None
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def timestamp_seconds(value) -> Optional[float]:
+    """
+    An ISO timestamp as epoch seconds, reading naive ones as UTC (the
+    producers write naive UTC); None if it does not parse.
+    """
+    parsed = parse_timestamp(value)
+    return parsed.replace(tzinfo=timezone.utc).timestamp() if parsed is not None else None
+
+class StdlibJsonCodec:
+    """Fallback codec using the standard library json module."""
+    name = "json"
+
+    def encode(self, transaction: Dict) -> bytes:
+        return json.dumps(transaction, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, body: Body) -> Dict:
+        # json.loads accepts bytes directly, skipping an explicit str decode
+        return json.loads(body)
+
+class OrjsonCodec:
+    """orjson encoder/decoder working on bytes."""
+    name = "orjson"
+
+    def encode(self, transaction: Dict) -> bytes:
+        return orjson.dumps(transaction)
+
+    def decode(self, body: Body) -> Dict:
+        return orjson.loads(body)
+
+class MsgspecCodec:
+    """
+    msgspec encoder/decoder working on bytes. Bodies are decoded untyped,
+    like json.loads: a typed schema would drop every field it does not
+    list, losing fields the producer adds.
+    """
+    name = "msgspec"
+
+    def __init__(self):
+        self.encoder = msgspec.json.Encoder()
+        self.decoder = msgspec.json.Decoder()
+
+    def encode(self, transaction: Dict) -> bytes:
+        return self.encoder.encode(transaction)
+
+    def decode(self, body: Body) -> Dict:
+        return self.decoder.decode(body)
+
+class MsgpackWireCodec:
+    """
+    Compact binary format: the transaction is encoded as a MessagePack array
+    in the field order of a versioned schema, so keys are not repeated in
+    every event.
+    """
+    name = "msgpack"
+
+    def __init__(self, version: int = SCHEMA_VERSION):
+        if msgspec is None:
+            raise ValueError("The msgpack wire format requires msgspec")
+        self.version = version
+
+        # Precompile the schema into top-level names plus nested (index, names) pairs
+        fields = TRANSACTION_SCHEMAS[version]
+        self.names = [field[0] if isinstance(field, tuple) else field for field in fields]
+        self.nested = [(index, field[1]) for index, field in enumerate(fields) if isinstance(field, tuple)]
+        self.encoder = msgspec.msgpack.Encoder()
+        self.decoder = msgspec.msgpack.Decoder()
+
+    @property
+    def content_type(self) -> str:
+        return f"{MSGPACK_CONTENT_TYPE}; v={self.version}"
+
+    @property
+    def group_content_type(self) -> str:
+        return f"{MSGPACK_CONTENT_TYPE}; v={self.version}; group=1"
+
+    def to_record(self, transaction: Dict) -> List:
+        record = [transaction.get(name) for name in self.names]
+        for index, names in self.nested:
+            value = record[index]
+            if value is not None:
+                record[index] = [value.get(name) for name in names]
+        return record
+
+    def from_record(self, record: List) -> Dict:
+        transaction = dict(zip(self.names, record))
+        for index, names in self.nested:
+            value = record[index]
+            if value is not None:
+                transaction[self.names[index]] = dict(zip(names, value))
+        return transaction
+
+    def encode(self, transaction: Dict) -> bytes:
+        return self.encoder.encode(self.to_record(transaction))
+
+    def decode(self, body: Body) -> Dict:
+        return self.from_record(self.decoder.decode(body))
+
+    def encode_many(self, transactions: List[Dict]) -> bytes:
+        return self.encoder.encode([self.to_record(transaction) for transaction in transactions])
+
+    def decode_many(self, body: Body) -> List[Dict]:
+        return [self.from_record(record) for record in self.decoder.decode(body)]
+
+def available_codecs() -> List[str]:
+    names = []
+    if msgspec is not None:
+        names.append("msgspec")
+    if orjson is not None:
+        names.append("orjson")
+    names.append("json")
+    return names
+
+def get_codec(name: Optional[str] = None):
+    """Return a codec by name, or the fastest available one for "auto"."""
+    name = name or TRANSACTION_CODEC
+    if name == "auto":
+        name = available_codecs()[0]
+    if name == "msgspec" and msgspec is not None:
+        return MsgspecCodec()
+    if name == "orjson" and orjson is not None:
+        return OrjsonCodec()
+    if name == "json":
+        return StdlibJsonCodec()
+    raise ValueError(f"Codec {name} is not available (installed: {', '.join(available_codecs())})")
+
+default_codec = get_codec()
+
+def encode_transaction(transaction: Dict) -> bytes:
+    return default_codec.encode(transaction)
+
+def decode_transaction(body: Body) -> Dict:
+    return default_codec.decode(body)
+
+_wire_codecs: Dict[int, MsgpackWireCodec] = {}
+
+def get_wire_codec(version: int = SCHEMA_VERSION) -> MsgpackWireCodec:
+    if version not in TRANSACTION_SCHEMAS:
+        raise ValueError(f"Unknown transaction schema version: {version}")
+    if version not in _wire_codecs:
+        _wire_codecs[version] = MsgpackWireCodec(version)
+    return _wire_codecs[version]
+
+@lru_cache(maxsize=64)
+def parse_content_type(content_type: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """Split "type; key=value" into the media type and its parameters."""
+    if not content_type:
+        return JSON_CONTENT_TYPE, {}
+    media_type, *params = [part.strip() for part in content_type.split(";")]
+    parameters = dict(param.split("=", 1) for param in params if "=" in param)
+    return media_type.lower(), parameters
+
+def encode_event_body(transaction: Dict, wire_format: Optional[str] = None) -> Tuple[bytes, str]:
+    """Encode a transaction for Event Hub. Returns the body and its content type."""
+    wire_format = wire_format or WIRE_FORMAT
+    if wire_format == "msgpack":
+        codec = get_wire_codec()
+        return codec.encode(transaction), codec.content_type
+    if wire_format == "json":
+        return default_codec.encode(transaction), JSON_CONTENT_TYPE
+    raise ValueError(f"Unknown wire format: {wire_format}")
+
+def compress(body: bytes, content_encoding: str) -> bytes:
+    if content_encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unknown content encoding: {content_encoding}")
+
+def decompress(body: Body, content_encoding: str) -> bytes:
+    if content_encoding == "gzip":
+        return gzip.decompress(body)
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd decompression requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unknown content encoding: {content_encoding}")
+
+def encode_group_body(transactions: List[Dict], wire_format: Optional[str] = None) -> Tuple[bytes, str]:
+    """Pack several transactions into one event body. Returns the body and its content type."""
+    wire_format = wire_format or WIRE_FORMAT
+    if wire_format == "msgpack":
+        codec = get_wire_codec()
+        return codec.encode_many(transactions), codec.group_content_type
+    if wire_format == "json":
+        return b"\n".join(default_codec.encode(transaction) for transaction in transactions), NDJSON_CONTENT_TYPE
+    raise ValueError(f"Unknown wire format: {wire_format}")
+
+def decode_body(body: Body, content_type: Optional[str] = None) -> Dict:
+    """Decode an event body in whichever wire format its content type names."""
+    media_type, parameters = parse_content_type(content_type)
+    if media_type == MSGPACK_CONTENT_TYPE:
+        return get_wire_codec(int(parameters.get("v", 1))).decode(body)
+    # Events without a content type predate wire-format negotiation and are JSON
+    return default_codec.decode(body)
+
+def event_body_bytes(event) -> bytes:
+    """Raw body of a received EventData without decoding it to str."""
+    body = event.body
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return body
+    # Received events expose the body as an iterable of data sections
+    return b"".join(body)
+
+def decode_bodies(body: Body, content_type: Optional[str] = None) -> List[Dict]:
+    """Decode a body that may hold a group of transactions."""
+    media_type, parameters = parse_content_type(content_type)
+    if media_type == NDJSON_CONTENT_TYPE:
+        return [default_codec.decode(line) for line in bytes(body).split(b"\n") if line]
+    if media_type == MSGPACK_CONTENT_TYPE and parameters.get("group") == "1":
+        return get_wire_codec(int(parameters.get("v", 1))).decode_many(body)
+    return [decode_body(body, content_type)]
+
+def event_content_encoding(event) -> Optional[str]:
+    """Compression algorithm named in the event properties, if any."""
+    properties = getattr(event, "properties", None) or {}
+    # Received application properties may come back with bytes keys and values
+    value = properties.get(CONTENT_ENCODING_PROPERTY) or properties.get(CONTENT_ENCODING_PROPERTY.encode())
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return value
+
+def decode_event_payload(event) -> Tuple[List[Dict], int]:
+    """
+    Decode an event into its transactions, decompressing and expanding
+    grouped events, along with the uncompressed body size in bytes.
+    """
+    body = event_body_bytes(event)
+    content_encoding = event_content_encoding(event)
+    if content_encoding:
+        body = decompress(body, content_encoding)
+    return decode_bodies(body, getattr(event, "content_type", None)), len(body)
+
+SAMPLE_TRANSACTION = {
+    "transaction_id": "6f1c7a52-3c6e-4c1e-9a57-0b7f6c2d9e11",
+    "timestamp": "2025-01-01T00:00:00.000000",
+    "sender": {
+        "name": "Jane Doe",
+        "address": "742 Evergreen Terrace\nSpringfield, OR 97403",
+        "account_number": "GB29NWBK60161331926819",
+        "bank_name": "Acme Holdings",
+        "swift_code": "NWBKGB2L",
+    },
+    "receiver": {
+        "name": "John Smith",
+        "address": "1600 Amphitheatre Pkwy\nMountain View, CA 94043",
+        "account_number": "DE89370400440532013000",
+        "bank_name": "Globex Corporation",
+        "swift_code": "COBADEFF",
+    },
+    "amount_usd": 245.17,
+    "sender_country": "USA",
+    "receiver_country": "DEU",
+    "transaction_type": "WIRE_TRANSFER",
+    "status": "COMPLETED",
+    "fee_usd": 7.45,
+    "reference": "Invoice settlement for consulting services.",
+    "metadata": {
+        "ip_address": "192.168.10.24",
+        "device_id": "0b1d4c8e-5f2a-4e3b-9c6d-7a8b9c0d1e2f",
+        "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+        "channel": "MOBILE_APP",
+    },
+}
+
+def benchmark(iterations: int = 100000) -> Dict[str, Dict[str, float]]:
+    """Report encode/decode microseconds per transaction for each available codec."""
+    results = {}
+    for name in available_codecs():
+        codec = get_codec(name)
+        body = codec.encode(SAMPLE_TRANSACTION)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            codec.encode(SAMPLE_TRANSACTION)
+        encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            codec.decode(body)
+        decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+        results[name] = {"encode_us": round(encode_us, 3), "decode_us": round(decode_us, 3), "bytes": len(body)}
+        print(f"{name:>12}: encode {encode_us:.2f} us/tx, decode {decode_us:.2f} us/tx, {len(body)} bytes")
+
+    # Binary wire formats, decoded through the same content-type dispatch as consumers
+    wire_formats = ["msgpack"] if msgspec is not None else []
+    for wire_format in wire_formats:
+        body, content_type = encode_event_body(SAMPLE_TRANSACTION, wire_format)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encode_event_body(SAMPLE_TRANSACTION, wire_format)
+        encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decode_body(body, content_type)
+        decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+        name = f"{wire_format}-v{SCHEMA_VERSION}"
+        results[name] = {"encode_us": round(encode_us, 3), "decode_us": round(decode_us, 3), "bytes": len(body)}
+        print(f"{name:>12}: encode {encode_us:.2f} us/tx, decode {decode_us:.2f} us/tx, {len(body)} bytes")
+
+    # Compressed groups; bytes are per transaction within a group of 100.
+    # Only the ids vary here, so real traffic compresses somewhat less.
+    group = [dict(SAMPLE_TRANSACTION, transaction_id=str(uuid.uuid4())) for _ in range(100)]
+    group_iterations = max(iterations // 100, 1)
+    for wire_format in ["json"] + wire_formats:
+        for content_encoding in ["gzip"] + (["zstd"] if zstandard is not None else []):
+            raw, content_type = encode_group_body(group, wire_format)
+            body = compress(raw, content_encoding)
+
+            start = time.perf_counter()
+            for _ in range(group_iterations):
+                decode_bodies(decompress(body, content_encoding), content_type)
+            decode_us = (time.perf_counter() - start) / (group_iterations * len(group)) * 1e6
+
+            name = f"{wire_format}+{content_encoding}"
+            per_tx = len(body) / len(group)
+            results[name] = {"decode_us": round(decode_us, 3), "bytes": round(per_tx, 1)}
+            print(f"{name:>12}: decode {decode_us:.2f} us/tx, {per_tx:.1f} bytes/tx in groups of {len(group)}")
+    return results
+
+if __name__ == "__main__":
+    benchmark(int(os.getenv("CODEC_BENCHMARK_ITERATIONS", 100000)))
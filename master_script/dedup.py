@@ -0,0 +1,242 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import sys
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+# Size each Bloom filter generation for about a day of a partition's transactions
+DEDUP_EXPECTED_ITEMS = int(os.getenv("DEDUP_EXPECTED_ITEMS", 1250000))  # transaction ids per generation
+# Also the share of new transactions dropped as Bloom-only hits once a generation is full
+DEDUP_FALSE_POSITIVE_RATE = float(os.getenv("DEDUP_FALSE_POSITIVE_RATE", 0.000001))  # ~29 bits per id
+# Most recent written ids kept exactly, to confirm Bloom filter hits
+DEDUP_RECENT_SIZE = int(os.getenv("DEDUP_RECENT_SIZE", 50000))
+# A Bloom filter hit outside the exact window: drop it as a probable duplicate, or keep it
+# (keep limits dedup to the exact window of DEDUP_RECENT_SIZE ids)
+DEDUP_BLOOM_ONLY = os.getenv("DEDUP_BLOOM_ONLY", "drop")  # drop | keep
+
+SNAPSHOT_VERSION = 1
+
+def encode_snapshot(header: Dict, filters: List[bytes], recent: List[str]) -> bytes:
+    """Gzipped snapshot: a JSON header line, the filter bits, then the recent ids."""
+    body = b"".join([json.dumps(header).encode("utf-8"), b"\n"] + filters + ["\n".join(recent).encode("utf-8")])
+    return gzip.compress(body, compresslevel=6)
+
+class BloomFilter:
+    """
+    Bloom filter over a bytearray, with k bit positions per key derived
+    from one 128-bit hash (double hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key: str):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def false_positive_rate(self) -> float:
+        """Current false positive probability, from the fraction of bits set."""
+        value = int.from_bytes(self.bits, "little")
+        filled = (value.bit_count() if hasattr(value, "bit_count") else bin(value).count("1")) / self.size
+        return filled ** self.hashes
+
+class Deduplicator:
+    """
+    Drops transactions whose transaction_id was already written, such as
+    events replayed from the last checkpoint after a restart.
+
+    Written ids go into a rotating pair of Bloom filters (each sized for
+    DEDUP_EXPECTED_ITEMS ids, so memory stays fixed and the horizon is one
+    to two generations) and into an exact set of the most recent ids. A
+    Bloom filter hit is a duplicate when the exact set confirms it; older
+    hits are dropped as probable duplicates (DEDUP_BLOOM_ONLY=drop), so
+    replays beyond the exact window are caught at the cost of dropping
+    about DEDUP_FALSE_POSITIVE_RATE of new transactions, which report()
+    estimates from the filters' fill. Ids are
+    only committed once their records are durable, so a crash never turns
+    an unwritten transaction into a "duplicate"; ids buffered meanwhile
+    are pending and drop repeats within the run.
+    """
+
+    def __init__(self, expected_items: int = DEDUP_EXPECTED_ITEMS,
+                 error_rate: float = DEDUP_FALSE_POSITIVE_RATE,
+                 recent_size: int = DEDUP_RECENT_SIZE, bloom_only: str = DEDUP_BLOOM_ONLY):
+        if bloom_only not in ("keep", "drop"):
+            raise ValueError(f"Unknown DEDUP_BLOOM_ONLY policy: {bloom_only}")
+        self.expected_items = expected_items
+        self.error_rate = error_rate
+        self.recent_size = recent_size
+        self.bloom_only = bloom_only
+        self.current = BloomFilter(expected_items, error_rate)
+        self.previous: Optional[BloomFilter] = None
+        # Insertion-ordered: the oldest id is evicted first
+        self.recent: "OrderedDict[str, None]" = OrderedDict()
+        self.pending = set()
+        # Ids committed so far; unchanged means no new snapshot is needed
+        self.committed = 0
+        # Version of the snapshot file last loaded or saved
+        self.etag: Optional[str] = None
+        self.checked = 0
+        self.duplicates = 0
+        self.bloom_only_hits = 0
+        self.rotations = 0
+
+    def __len__(self) -> int:
+        return self.current.count + (self.previous.count if self.previous else 0)
+
+    def is_duplicate(self, transaction_id: str) -> bool:
+        self.checked += 1
+        if transaction_id in self.pending or transaction_id in self.recent:
+            self.duplicates += 1
+            return True
+        if transaction_id in self.current or (self.previous is not None and transaction_id in self.previous):
+            self.bloom_only_hits += 1
+            if self.bloom_only == "drop":
+                self.duplicates += 1
+                return True
+        return False
+
+    def filter(self, transactions: List[Dict]) -> List[Dict]:
+        """
+        Transactions not seen before (including earlier in the same batch);
+        these become pending until commit().
+        """
+        unique = []
+        for transaction in transactions:
+            transaction_id = transaction.get("transaction_id")
+            if transaction_id is None:
+                unique.append(transaction)
+            elif not self.is_duplicate(transaction_id):
+                self.pending.add(transaction_id)
+                unique.append(transaction)
+        return unique
+
+    def commit(self, transactions: Iterable[Dict]):
+        """Remember the ids of transactions that are now durably written."""
+        recent = self.recent
+        for transaction in transactions:
+            transaction_id = transaction.get("transaction_id")
+            if transaction_id is None:
+                continue
+            self.pending.discard(transaction_id)
+            if self.current.full():
+                self.previous, self.current = self.current, BloomFilter(self.expected_items, self.error_rate)
+                self.rotations += 1
+            self.current.add(transaction_id)
+            self.committed += 1
+            recent[transaction_id] = None
+            if len(recent) > self.recent_size:
+                recent.popitem(last=False)
+
+    def discard_pending(self):
+        """Forget the ids buffered by an earlier run: their records were never written."""
+        self.pending.clear()
+
+    def snapshot_parts(self) -> List:
+        """Copy of the committed state; pending ids are not persisted."""
+        filters = [bloom for bloom in (self.current, self.previous) if bloom is not None]
+        header = {"version": SNAPSHOT_VERSION, "size": self.current.size, "hashes": self.current.hashes,
+                  "capacity": self.expected_items, "error_rate": self.error_rate,
+                  "counts": [bloom.count for bloom in filters]}
+        return [header, [bytes(bloom.bits) for bloom in filters], list(self.recent)]
+
+    def restore(self, snapshot: bytes):
+        """Replace the committed state with a snapshot written by save()."""
+        data = gzip.decompress(snapshot)
+        header_end = data.index(b"\n")
+        header = json.loads(data[:header_end])
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported dedup snapshot version: {header.get('version')}")
+        filter_bytes = (header["size"] + 7) // 8
+        offset = header_end + 1
+        filters = []
+        for count in header["counts"]:
+            filters.append((data[offset:offset + filter_bytes], count))
+            offset += filter_bytes
+        recent_ids = data[offset:].decode("utf-8").split("\n") if offset < len(data) else []
+        self.recent = OrderedDict.fromkeys(recent_ids[-self.recent_size:])
+        # Filters sized differently are dropped; the exact window still catches recent replays
+        if (header["capacity"], header["error_rate"]) != (self.expected_items, self.error_rate):
+            return
+        blooms = []
+        for bits, count in filters:
+            bloom = BloomFilter(self.expected_items, self.error_rate)
+            bloom.bits[:] = bits
+            bloom.count = count
+            blooms.append(bloom)
+        self.current = blooms[0]
+        self.previous = blooms[1] if len(blooms) > 1 else None
+
+    async def save(self, file_client, encoder=None) -> int:
+        """
+        Upload a snapshot to a Data Lake file, compressing it in encoder
+        (a worker_pool.EncodePool) if given. Returns its size in bytes.
+        """
+        parts = self.snapshot_parts()
+        if encoder is None:
+            content = encode_snapshot(*parts)
+        else:
+            content = await encoder.run(encode_snapshot, *parts)
+        result = await file_client.upload_data(content, overwrite=True)
+        self.etag = result.get("etag")
+        return len(content)
+
+    async def load(self, file_client) -> bool:
+        """Restore from a Data Lake file; False if no snapshot exists yet."""
+        try:
+            download = await file_client.download_file()
+        except ResourceNotFoundError:
+            return False
+        self.restore(await download.readall())
+        self.etag = download.properties.etag
+        return True
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the filters and the exact window."""
+        filters = len(self.current.bits) + (len(self.previous.bits) if self.previous else 0)
+        recent = sys.getsizeof(self.recent) + sum(sys.getsizeof(key) for key in self.recent)
+        return filters + recent
+
+    def report(self) -> Dict:
+        """Counters, estimated false positive rate and memory footprint, for sizing."""
+        filters = [bloom for bloom in (self.current, self.previous) if bloom is not None]
+        # A key is a false positive if either generation reports it
+        false_positive_rate = 1 - math.prod(1 - bloom.false_positive_rate() for bloom in filters)
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "bloom_only_hits": self.bloom_only_hits,
+            "pending": len(self.pending),
+            "ids": len(self),
+            "recent": len(self.recent),
+            "rotations": self.rotations,
+            "bits_per_id": self.current.size / self.expected_items,
+            "hashes": self.current.hashes,
+            "false_positive_rate": false_positive_rate,
+            "memory_mb": self.memory_bytes() / 1024 / 1024,
+        }
+
@@ -4,7 +4,7 @@ import json
 import os
 import random
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional
 import azure.functions as func
 from azure.eventhub import EventData
 from azure.eventhub.aio import EventHubProducerClient
@@ -21,10 +21,12 @@ HIGH_RISK_MIN_AMOUNT = float(os.getenv("HIGH_RISK_MIN_AMOUNT", 1000000))
 HIGH_RISK_MAX_AMOUNT = float(os.getenv("HIGH_RISK_MAX_AMOUNT", 5000000))
 FRAUD_PROBABILITY = float(os.getenv("FRAUD_PROBABILITY", 0.005))
 SANCTIONED_COUNTRIES = ["PRK", "IRN", "SYR", "CUB"]
+BURST_SIZE = int(os.getenv("PRODUCER_BURST_SIZE", 1))  # transactions sent per timer tick
 
 class TransactionGenerator:
     def __init__(self):
         self.country_codes = [country.alpha_3 for country in pycountry.countries]
+        self.clean_country_codes = [c for c in self.country_codes if c not in SANCTIONED_COUNTRIES]
         
     def generate_person_info(self) -> Dict:
         return {
@@ -48,7 +50,7 @@ class TransactionGenerator:
             sender_country = random.choice(SANCTIONED_COUNTRIES) if random.random() < 0.3 else random.choice(self.country_codes)
         else:
             amount = random.uniform(MIN_AMOUNT, MAX_AMOUNT)
-            sender_country = random.choice([c for c in self.country_codes if c not in SANCTIONED_COUNTRIES])
+            sender_country = random.choice(self.clean_country_codes)
 
         return {
             "transaction_id": fake.uuid4(),
@@ -70,22 +72,64 @@ class TransactionGenerator:
             }
         }
 
-async def send_to_eventhub(transaction: Dict):
-    connection_str = os.getenv("EVENT_HUB_CONNECTION_STR")
-    eventhub_name = os.getenv("EVENT_HUB_NAME")
-    
-    if not all([connection_str, eventhub_name]):
-        raise ValueError("Missing Event Hub connection settings")
-        
-    producer = EventHubProducerClient.from_connection_string(
-        conn_str=connection_str,
-        eventhub_name=eventhub_name
-    )
-    
-    async with producer:
-        event_data_batch = await producer.create_batch()
-        event_data_batch.add(EventData(json.dumps(transaction)))
-        await producer.send_batch(event_data_batch)
+# Reused across warm invocations of the same worker
+transaction_generator: Optional[TransactionGenerator] = None
+producer: Optional[EventHubProducerClient] = None
+
+def get_generator() -> TransactionGenerator:
+    global transaction_generator
+    if transaction_generator is None:
+        transaction_generator = TransactionGenerator()
+    return transaction_generator
+
+def get_producer() -> EventHubProducerClient:
+    global producer
+    if producer is None:
+        connection_str = os.getenv("EVENT_HUB_CONNECTION_STR")
+        eventhub_name = os.getenv("EVENT_HUB_NAME")
+
+        if not all([connection_str, eventhub_name]):
+            raise ValueError("Missing Event Hub connection settings")
+
+        producer = EventHubProducerClient.from_connection_string(
+            conn_str=connection_str,
+            eventhub_name=eventhub_name
+        )
+    return producer
+
+async def reset_producer():
+    """Drop the cached client so the next invocation reconnects."""
+    global producer
+    if producer is not None:
+        try:
+            await producer.close()
+        except Exception as e:
+            logging.warning('Error closing Event Hub producer: %s', e)
+        producer = None
+
+async def send_to_eventhub(transactions: List[Dict]) -> int:
+    """Send transactions in as few batches as possible. Returns the number of batches."""
+    client = get_producer()
+    batches = 0
+    try:
+        event_data_batch = await client.create_batch()
+        for transaction in transactions:
+            event = EventData(json.dumps(transaction))
+            try:
+                event_data_batch.add(event)
+            except ValueError:
+                # Batch is full; send it and carry on with a new one
+                await client.send_batch(event_data_batch)
+                batches += 1
+                event_data_batch = await client.create_batch()
+                event_data_batch.add(event)
+        if len(event_data_batch):
+            await client.send_batch(event_data_batch)
+            batches += 1
+    except Exception:
+        await reset_producer()
+        raise
+    return batches
 
 @app.timer_trigger(schedule="* */3 * * * *", arg_name="myTimer", run_on_startup=False,
               use_monitor=False) 
@@ -94,9 +138,9 @@ async def eaglebankproducer(myTimer: func.TimerRequest) -> None:
         logging.info('The timer is past due!')
 
     try:
-        transaction_generator = TransactionGenerator()
-        transaction = transaction_generator.generate_transaction()
-        await send_to_eventhub(transaction)
-        logging.info(f'Successfully sent transaction {transaction["transaction_id"]}')
+        generator = get_generator()
+        transactions = [generator.generate_transaction() for _ in range(BURST_SIZE)]
+        batches = await send_to_eventhub(transactions)
+        logging.info('Successfully sent %d transactions in %d batch(es)', len(transactions), batches)
     except Exception as e:
-        logging.error(f'Error generating/sending transaction: {str(e)}')
\ No newline at end of file
+        logging.error('Error generating/sending transaction: %s', e)
\ No newline at end of file
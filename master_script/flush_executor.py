@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Dict, Set
+
+# Uploads running at once per Data Lake container, and queued or running overall
+FLUSH_CONCURRENCY = int(os.getenv("FLUSH_CONCURRENCY", 4))
+FLUSH_MAX_PENDING = int(os.getenv("FLUSH_MAX_PENDING", 32))
+
+class FlushExecutor:
+    """
+    Runs Data Lake uploads as background tasks so event intake continues
+    while I/O is in flight.
+
+    Each container runs at most `concurrency` uploads at a time. Once
+    `max_pending` uploads are queued or running, submit() waits, which
+    applies backpressure to the event callbacks instead of buffering
+    without bound. Uploads are expected to handle (restore) their own
+    failures; the executor logs and counts them.
+    """
+
+    def __init__(self, concurrency: int = FLUSH_CONCURRENCY, max_pending: int = FLUSH_MAX_PENDING):
+        self.concurrency = concurrency
+        self.slots: Dict[str, asyncio.Semaphore] = {}
+        self.pending = asyncio.Semaphore(max_pending)
+        self.tasks: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failures = 0
+
+    async def submit(self, container_name: str, upload: Awaitable) -> asyncio.Task:
+        """Schedule an upload coroutine for a container."""
+        try:
+            await self.pending.acquire()
+        except BaseException:
+            upload.close()
+            raise
+        task = asyncio.get_running_loop().create_task(self._run(container_name, upload))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _run(self, container_name: str, upload: Awaitable):
+        try:
+            async with self.slots.setdefault(container_name, asyncio.Semaphore(self.concurrency)):
+                await upload
+            self.completed += 1
+        except Exception as e:
+            self.failures += 1
+            logging.error("Upload to %s failed (%d failures so far): %s", container_name, self.failures, e)
+        finally:
+            self.pending.release()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.tasks)
+
+    async def drain(self):
+        """Wait until every submitted upload has finished."""
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
@@ -0,0 +1,223 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Flush policy per container: write a file when any limit is reached first
+NORMAL_FLUSH_MAX_RECORDS = int(os.getenv("NORMAL_FLUSH_MAX_RECORDS", 5000))
+NORMAL_FLUSH_MAX_BYTES = int(os.getenv("NORMAL_FLUSH_MAX_BYTES", 16 * 1024 * 1024))
+NORMAL_FLUSH_MAX_AGE_SECONDS = float(os.getenv("NORMAL_FLUSH_MAX_AGE_SECONDS", 60))
+# Suspicious transactions keep a short deadline so alerts are not delayed
+SUSPICIOUS_FLUSH_MAX_RECORDS = int(os.getenv("SUSPICIOUS_FLUSH_MAX_RECORDS", 500))
+SUSPICIOUS_FLUSH_MAX_BYTES = int(os.getenv("SUSPICIOUS_FLUSH_MAX_BYTES", 1024 * 1024))
+SUSPICIOUS_FLUSH_MAX_AGE_SECONDS = float(os.getenv("SUSPICIOUS_FLUSH_MAX_AGE_SECONDS", 2))
+# How often idle buffers are checked against their max age
+FLUSH_CHECK_INTERVAL = float(os.getenv("FLUSH_CHECK_INTERVAL", 0.5))  # seconds
+# A container whose upload failed waits this long before its next attempt, doubling per failure
+FLUSH_RETRY_BACKOFF_SECONDS = float(os.getenv("FLUSH_RETRY_BACKOFF_SECONDS", 1))
+FLUSH_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv("FLUSH_RETRY_MAX_BACKOFF_SECONDS", 60))
+
+# (partition_context, event, events covered)
+Position = Tuple[object, object, int]
+
+class FlushPolicy:
+    """
+    Limits after which a container buffer is written to the Data Lake.
+    """
+
+    def __init__(self, max_records: int, max_bytes: int, max_age: float):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def due(self, records: int, size: int, age: float) -> bool:
+        return records >= self.max_records or size >= self.max_bytes or age >= self.max_age
+
+NORMAL_FLUSH_POLICY = FlushPolicy(NORMAL_FLUSH_MAX_RECORDS, NORMAL_FLUSH_MAX_BYTES, NORMAL_FLUSH_MAX_AGE_SECONDS)
+SUSPICIOUS_FLUSH_POLICY = FlushPolicy(SUSPICIOUS_FLUSH_MAX_RECORDS, SUSPICIOUS_FLUSH_MAX_BYTES,
+                                      SUSPICIOUS_FLUSH_MAX_AGE_SECONDS)
+
+class FlushChunk:
+    """
+    Records detached from a container for one upload, with the mark needed
+    to put them back or to advance the durable position in order.
+    """
+
+    def __init__(self, records: List[Dict], size: int, first_added: Optional[float],
+                 written_upto: int, written_position):
+        self.records = records
+        self.bytes = size
+        self.first_added = first_added
+        self.written_upto = written_upto
+        self.written_position = written_position
+
+class ContainerBuffer:
+    """
+    Records of one partition waiting for one container.
+
+    `written_upto` counts the partition's tracked events whose records for
+    this container are all written; it is only meaningful while records are
+    buffered (an empty container holds nothing back). Chunks being uploaded
+    stay in `in_flight` until their upload completes. After a failed
+    upload the container is not due again before `retry_after`.
+    """
+
+    def __init__(self, name: str, policy: FlushPolicy):
+        self.name = name
+        self.policy = policy
+        self.records: List[Dict] = []
+        self.bytes = 0
+        self.first_added: Optional[float] = None
+        self.written_upto = 0
+        self.written_position = None
+        self.in_flight: List[FlushChunk] = []
+        self.failures = 0
+        self.retry_after: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def age(self, now: Optional[float] = None) -> float:
+        if self.first_added is None:
+            return 0.0
+        return (now or time.monotonic()) - self.first_added
+
+    def due(self, now: Optional[float] = None) -> bool:
+        now = now or time.monotonic()
+        if self.retry_after is not None and now < self.retry_after:
+            return False
+        return bool(self.records) and self.policy.due(len(self.records), self.bytes, self.age(now))
+
+    def mark(self):
+        """(written_upto, position) holding back durability, or None if nothing does."""
+        # Retried records of a failed upload can be older than uploads started after them
+        marks = [(chunk.written_upto, chunk.written_position) for chunk in self.in_flight]
+        if self.records:
+            marks.append((self.written_upto, self.written_position))
+        return min(marks, key=lambda mark: mark[0]) if marks else None
+
+class PartitionBuffer:
+    """
+    Transactions received from one Event Hub partition and not yet written
+    to the Data Lake.
+
+    Every partition owns its buffer, so a flush only uploads (and later
+    checkpoints) events of its own partition, and partitions never wait on
+    each other. The normal and suspicious containers flush independently
+    under their own FlushPolicy and several uploads may be in flight at
+    once; an event only becomes durable once every container has written
+    its records and every earlier upload has completed, so the durable
+    position only moves forward whatever order uploads finish in.
+    """
+
+    def __init__(self, partition_id: str, normal_policy: FlushPolicy = NORMAL_FLUSH_POLICY,
+                 suspicious_policy: FlushPolicy = SUSPICIOUS_FLUSH_POLICY):
+        self.partition_id = partition_id
+        self.normal = ContainerBuffer("normal", normal_policy)
+        self.suspicious = ContainerBuffer("suspicious", suspicious_policy)
+        self.containers = (self.normal, self.suspicious)
+        self.tracked = 0
+        self.position = None
+        self.durable_upto = 0
+
+    def __len__(self) -> int:
+        return len(self.normal) + len(self.suspicious)
+
+    def add(self, container: ContainerBuffer, records: List[Dict], size: int):
+        """Buffer classified records; size is their approximate encoded bytes."""
+        if not records:
+            return
+        if not container.records:
+            # Everything tracked so far has already been handed to an upload
+            container.written_upto = self.tracked
+            container.written_position = self.position
+            container.first_added = time.monotonic()
+        container.records.extend(records)
+        container.bytes += size
+
+    def track(self, partition_context, event, count: int = 1):
+        """Remember the latest buffered event (covering count events)."""
+        self.tracked += count
+        self.position = (partition_context, event)
+
+    def due_containers(self, now: Optional[float] = None) -> List[ContainerBuffer]:
+        now = now or time.monotonic()
+        return [container for container in self.containers if container.due(now)]
+
+    def take(self, container: ContainerBuffer) -> FlushChunk:
+        """Detach a container's records for an upload."""
+        chunk = FlushChunk(container.records, container.bytes, container.first_added,
+                           container.written_upto, container.written_position)
+        container.records, container.bytes, container.first_added = [], 0, None
+        container.in_flight.append(chunk)
+        return chunk
+
+    def restore(self, container: ContainerBuffer, chunk: FlushChunk):
+        """
+        Put back records whose upload failed, ahead of newer ones, and hold
+        the container back from the next due flush with an exponential
+        backoff (their first_added is kept, so they would be due at once).
+        """
+        container.in_flight.remove(chunk)
+        backoff = FLUSH_RETRY_BACKOFF_SECONDS * 2 ** min(container.failures, 30)
+        container.failures += 1
+        container.retry_after = time.monotonic() + min(backoff, FLUSH_RETRY_MAX_BACKOFF_SECONDS)
+        if not container.records or chunk.written_upto < container.written_upto:
+            container.written_upto = chunk.written_upto
+            container.written_position = chunk.written_position
+        if chunk.first_added is not None:
+            container.first_added = min(container.first_added or chunk.first_added, chunk.first_added)
+        container.records[:0] = chunk.records
+        container.bytes += chunk.bytes
+
+    def complete(self, container: ContainerBuffer, chunk: FlushChunk) -> Optional[Position]:
+        """
+        Record a successful upload and advance the durable position. Returns
+        the newly durable (partition_context, event, count), or None.
+        """
+        container.in_flight.remove(chunk)
+        container.failures, container.retry_after = 0, None
+        upto, position = self.tracked, self.position
+        for buffered in self.containers:
+            mark = buffered.mark()
+            if mark and mark[0] < upto:
+                upto, position = mark
+        if upto <= self.durable_upto or position is None:
+            return None
+        count, self.durable_upto = upto - self.durable_upto, upto
+        return position[0], position[1], count
+
+class FlushStats:
+    """
+    Per-container flush statistics: records, bytes, age at flush and upload time.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, container: str, records: int, size: int, age: float, upload_seconds: float):
+        totals = self.totals.setdefault(container, {
+            "flushes": 0, "records": 0, "bytes": 0,
+            "age_seconds": 0.0, "max_age_seconds": 0.0,
+            "upload_seconds": 0.0, "max_upload_seconds": 0.0,
+        })
+        totals["flushes"] += 1
+        totals["records"] += records
+        totals["bytes"] += size
+        totals["age_seconds"] += age
+        totals["max_age_seconds"] = max(totals["max_age_seconds"], age)
+        totals["upload_seconds"] += upload_seconds
+        totals["max_upload_seconds"] = max(totals["max_upload_seconds"], upload_seconds)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Totals per container plus averages per flush."""
+        report = {}
+        for container, totals in self.totals.items():
+            flushes = totals["flushes"] or 1
+            report[container] = dict(
+                totals,
+                avg_records=totals["records"] / flushes,
+                avg_bytes=totals["bytes"] / flushes,
+                avg_age_seconds=totals["age_seconds"] / flushes,
+                avg_upload_seconds=totals["upload_seconds"] / flushes,
+            )
+        return report
@@ -0,0 +1,130 @@
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from account_state import AccountStateStore
+from dedup import Deduplicator
+
+# Snapshots are written next to the checkpoints, one file per partition
+ACCOUNT_STATE_PATH = os.getenv("ACCOUNT_STATE_PATH", "account-state/{event_hub}/{consumer_group}/{partition_id}.json.gz")
+DEDUP_STATE_PATH = os.getenv("DEDUP_STATE_PATH", "dedup/{event_hub}/{consumer_group}/{partition_id}.bin.gz")
+# Dedup snapshots (megabytes of Bloom filter) are written with a checkpoint at most this often
+DEDUP_SNAPSHOT_SECONDS = float(os.getenv("DEDUP_SNAPSHOT_SECONDS", 300))
+
+def state_path(template: str, event_hub: str, consumer_group: str, partition_id: str) -> str:
+    """Snapshot path of one partition from a template with {event_hub}, {consumer_group} and {partition_id}."""
+    if "{partition_id}" not in template:
+        raise ValueError(f"State path {template} must contain {{partition_id}}, or consumers owning "
+                         f"different partitions overwrite each other's snapshot")
+    return template.format(event_hub=event_hub, consumer_group=consumer_group, partition_id=partition_id)
+
+async def snapshot_changed(store, file_client) -> bool:
+    """Whether the snapshot file differs from the version the store last loaded or saved."""
+    if store.etag is None:
+        return True
+    try:
+        properties = await file_client.get_file_properties()
+    except ResourceNotFoundError:
+        return False
+    return properties.etag != store.etag
+
+class PartitionState:
+    """
+    Detection and dedup state of one partition, snapshotted to files of
+    its own.
+
+    A partition has a single owner at a time, so consumers sharing the
+    partitions never overwrite each other's snapshots, and a partition
+    taken over by another consumer brings its state along. The snapshots
+    are written just before the partition is checkpointed (see
+    PartitionCheckpointer.before_checkpoint): the account state with every
+    checkpoint, so it matches the position a restart replays from, the
+    dedup state at most every DEDUP_SNAPSHOT_SECONDS.
+
+    States are kept for the life of the process (see partition_state()),
+    so a snapshot is only downloaded again if another consumer wrote it
+    meanwhile.
+    """
+
+    def __init__(self, partition_id: str, event_hub: str, consumer_group: str, stateful: bool, dedup: bool):
+        self.partition_id = partition_id
+        self.accounts = AccountStateStore() if stateful else None
+        self.dedup = Deduplicator() if dedup else None
+        self.account_state_path = state_path(ACCOUNT_STATE_PATH, event_hub, consumer_group, partition_id)
+        self.dedup_state_path = state_path(DEDUP_STATE_PATH, event_hub, consumer_group, partition_id)
+        # AccountStateStore.observed and Deduplicator.committed at their last snapshot
+        self.saved_observed = 0
+        self.saved_committed = 0
+        self.dedup_saved_at = time.monotonic()
+
+    async def load(self, file_client: Callable[[str], object]) -> List[str]:
+        """
+        Restore the snapshots (file_client maps a path to its Data Lake file
+        client) unless the state held is already up to date; the names of
+        the stores restored.
+        """
+        restored = []
+        if self.accounts is not None:
+            client = file_client(self.account_state_path)
+            if self.accounts.observed != self.saved_observed:
+                # Observed past the last snapshot, so possibly past the checkpoint: start over from the snapshot
+                self.accounts = AccountStateStore()
+            if await snapshot_changed(self.accounts, client) and await self.accounts.load(client):
+                restored.append("account state")
+            self.saved_observed = self.accounts.observed
+        if self.dedup is not None:
+            # Ids committed since the last snapshot were written all the same; keep them
+            self.dedup.discard_pending()
+            client = file_client(self.dedup_state_path)
+            if await snapshot_changed(self.dedup, client) and await self.dedup.load(client):
+                restored.append("dedup state")
+            self.saved_committed = self.dedup.committed
+        return restored
+
+    async def save_accounts(self, file_client: Callable[[str], object], encoder=None) -> Optional[int]:
+        """
+        Snapshot the account state if it changed since the last snapshot;
+        its size in bytes, or None. Call it just before checkpointing.
+        """
+        if self.accounts is None or self.accounts.observed == self.saved_observed:
+            return None
+        observed = self.accounts.observed
+        size = await self.accounts.save(file_client(self.account_state_path), encoder)
+        self.saved_observed = observed
+        return size
+
+    async def save_dedup(self, file_client: Callable[[str], object], encoder=None,
+                         force: bool = False) -> Optional[int]:
+        """
+        Snapshot the dedup state if ids were committed since the last
+        snapshot and DEDUP_SNAPSHOT_SECONDS have passed (or force); its size
+        in bytes, or None.
+        """
+        if self.dedup is None or self.dedup.committed == self.saved_committed:
+            return None
+        if not force and time.monotonic() - self.dedup_saved_at < DEDUP_SNAPSHOT_SECONDS:
+            return None
+        committed = self.dedup.committed
+        self.dedup_saved_at = time.monotonic()
+        size = await self.dedup.save(file_client(self.dedup_state_path), encoder)
+        self.saved_committed = committed
+        return size
+
+# (event hub, consumer group, partition_id) -> state kept by this process
+_states: Dict[Tuple[str, str, str], PartitionState] = {}
+
+def partition_state(event_hub: str, consumer_group: str, partition_id: str,
+                    stateful: bool, dedup: bool) -> PartitionState:
+    """
+    The state this process keeps for a partition, created on first use.
+    It outlives the consumer: a timer function invoked again in the same
+    worker (or a restarted consumer service) picks it up without
+    downloading the snapshots again.
+    """
+    key = (event_hub, consumer_group, partition_id)
+    state = _states.get(key)
+    if state is None:
+        state = _states[key] = PartitionState(partition_id, event_hub, consumer_group, stateful, dedup)
+    return state
@@ -1,16 +1,33 @@
 import asyncio
-import json
+import gzip
+import logging
+import multiprocessing
 import os
+import queue
 import random
-from datetime import datetime
-from typing import Dict, List
+import signal
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
 
 from azure.eventhub import EventData
 from azure.eventhub.aio import EventHubProducerClient
 from dotenv import load_dotenv
 from faker import Faker
+import numpy as np
 import pycountry
 
+from event_log import EventLog, configure_logging
+from transaction_codec import (
+    CONTENT_ENCODING_PROPERTY,
+    compress,
+    decode_transaction,
+    encode_event_body,
+    encode_group_body,
+    encode_transaction,
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -25,6 +42,52 @@ HIGH_RISK_MIN_AMOUNT = float(os.getenv("HIGH_RISK_MIN_AMOUNT", 1000000))
 HIGH_RISK_MAX_AMOUNT = float(os.getenv("HIGH_RISK_MAX_AMOUNT", 5000000))
 FRAUD_PROBABILITY = float(os.getenv("FRAUD_PROBABILITY", 0.005))
 
+# Size of the precomputed Faker value pools used by generate_batch
+GENERATOR_POOL_SIZE = int(os.getenv("GENERATOR_POOL_SIZE", 2000))
+
+# Persistent producer batching configurations
+PRODUCER_MAX_BATCH_EVENTS = int(os.getenv("PRODUCER_MAX_BATCH_EVENTS", 500))
+PRODUCER_MAX_BATCH_BYTES = int(os.getenv("PRODUCER_MAX_BATCH_BYTES", 0)) or None  # None = hub maximum
+PRODUCER_LINGER_SECONDS = float(os.getenv("PRODUCER_LINGER_SECONDS", 0.5))
+PRODUCER_STATS_INTERVAL = float(os.getenv("PRODUCER_STATS_INTERVAL", 30))
+PRODUCER_COMPRESSION = os.getenv("PRODUCER_COMPRESSION", "none")  # none | gzip | zstd
+PRODUCER_COMPRESSION_GROUP = int(os.getenv("PRODUCER_COMPRESSION_GROUP", 100))  # transactions per compressed event
+PRODUCER_SEND_RETRIES = int(os.getenv("PRODUCER_SEND_RETRIES", 3))
+PRODUCER_RETRY_BACKOFF_SECONDS = float(os.getenv("PRODUCER_RETRY_BACKOFF_SECONDS", 0.2))
+
+# Pipelined producer configurations (generation and sending overlap through a bounded queue)
+PRODUCER_PIPELINE = os.getenv("PRODUCER_PIPELINE", "false").lower() == "true"
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 200))  # chunks of transactions
+PIPELINE_SENDERS = int(os.getenv("PIPELINE_SENDERS", 4))
+
+# Load-generation configurations (PRODUCER_MODE=load)
+PRODUCER_MODE = os.getenv("PRODUCER_MODE", "interval")  # interval | load | multiprocess | corpus | replay
+LOAD_TARGET_RATE = float(os.getenv("LOAD_TARGET_RATE", 5000))  # transactions per second
+LOAD_PROFILE = os.getenv("LOAD_PROFILE", "constant")  # constant | step | linear | spike
+LOAD_RAMP_SECONDS = float(os.getenv("LOAD_RAMP_SECONDS", 60))
+LOAD_STEPS = int(os.getenv("LOAD_STEPS", 5))
+LOAD_SPIKE_BASE_FRACTION = float(os.getenv("LOAD_SPIKE_BASE_FRACTION", 0.2))
+LOAD_SPIKE_SECONDS = float(os.getenv("LOAD_SPIKE_SECONDS", 10))
+LOAD_TOTAL_COUNT = int(os.getenv("LOAD_TOTAL_COUNT", 0))  # 0 = no count limit
+LOAD_DURATION_SECONDS = float(os.getenv("LOAD_DURATION_SECONDS", 300))  # 0 = no time limit
+LOAD_SENDERS = int(os.getenv("LOAD_SENDERS", 4))
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", 50))
+
+# Multi-process producer configurations (PRODUCER_MODE=multiprocess)
+PRODUCER_WORKERS = int(os.getenv("PRODUCER_WORKERS", os.cpu_count() or 1))
+PRODUCER_PARTITION_IDS = [p for p in os.getenv("PRODUCER_PARTITION_IDS", "").split(",") if p]  # empty = discover
+PRODUCER_PIN_BY = os.getenv("PRODUCER_PIN_BY", "partition")  # partition | key
+
+# Seeded corpus (PRODUCER_MODE=corpus) and replay (PRODUCER_MODE=replay) configurations
+CORPUS_PATH = os.getenv("CORPUS_PATH", "transactions_corpus.ndjson")  # .ndjson[.gz] or .parquet
+CORPUS_COUNT = int(os.getenv("CORPUS_COUNT", 100000))
+CORPUS_SEED = int(os.getenv("CORPUS_SEED", 42))
+CORPUS_START_TIME = os.getenv("CORPUS_START_TIME", "2025-01-01T00:00:00")
+CORPUS_INTERVAL_MS = float(os.getenv("CORPUS_INTERVAL_MS", 100))  # spacing of seeded timestamps
+REPLAY_RATE = float(os.getenv("REPLAY_RATE", 0))  # transactions per second, 0 = as fast as possible
+REPLAY_TARGET = os.getenv("REPLAY_TARGET", "eventhub")  # eventhub | local
+REPLAY_LOCAL_PATH = os.getenv("REPLAY_LOCAL_PATH", "")  # local stand-in output, empty = discard
+
 # Initialize Faker
 fake = Faker()
 
@@ -36,18 +99,50 @@ SANCTIONED_COUNTRIES = [
     "CUB",  # Cuba
 ]
 
+CHANNELS = ["MOBILE_APP", "WEB", "BRANCH", "API"]
+
 class TransactionGenerator:
-    def __init__(self):
+    def __init__(self, pool_size: int = GENERATOR_POOL_SIZE, seed: Optional[int] = None,
+                 start_time: Optional[datetime] = None, interval_ms: float = CORPUS_INTERVAL_MS):
         self.country_codes = [country.alpha_3 for country in pycountry.countries]
+        self.clean_country_codes = [c for c in self.country_codes if c not in SANCTIONED_COUNTRIES]
+
+        # A seed gives this generator its own random sources and a synthetic
+        # clock, so the same seed always yields the same transactions
+        self.seed = seed
+        if seed is None:
+            self.random = random
+            self.fake = fake
+            self.start_time = None
+        else:
+            self.random = random.Random(seed)
+            self.fake = Faker()
+            self.fake.seed_instance(seed)
+            self.start_time = start_time or datetime.fromisoformat(CORPUS_START_TIME)
+        self.interval = timedelta(milliseconds=interval_ms)
+        self.generated = 0
+
+        # Bulk generation state; pools are built lazily on the first generate_batch call
+        self.pool_size = pool_size
+        self.rng = np.random.default_rng(seed)
+        self.pools = None
+
+    def timestamps(self, n: int) -> List[str]:
+        """Timestamps for the next n transactions."""
+        first = self.generated
+        self.generated += n
+        if self.start_time is None:
+            return [datetime.utcnow().isoformat()] * n
+        return [(self.start_time + self.interval * (first + i)).isoformat() for i in range(n)]
         
     def generate_person_info(self) -> Dict:
         """Generate person information including name, address, and account details."""
         return {
-            "name": fake.name(),
-            "address": fake.address(),
-            "account_number": fake.bban(),
-            "bank_name": fake.company(),
-            "swift_code": fake.swift(),
+            "name": self.fake.name(),
+            "address": self.fake.address(),
+            "account_number": self.fake.bban(),
+            "bank_name": self.fake.company(),
+            "swift_code": self.fake.swift(),
         }
 
     def calculate_fee(self, amount: float) -> float:
@@ -56,25 +151,31 @@ class TransactionGenerator:
         percentage_fee = amount * 0.01  # 1% fee
         return min(base_fee + percentage_fee, 50.0)  # Cap fee at $50
 
+    def calculate_fees(self, amounts: np.ndarray) -> np.ndarray:
+        """Vectorized calculate_fee for an array of amounts."""
+        return np.minimum(5.0 + amounts * 0.01, 50.0)
+
     def generate_transaction(self) -> Dict:
         """Generate a single transaction with random properties."""
+        rand = self.random
+
         # Determine if this will be a suspicious transaction
-        is_suspicious = random.random() < FRAUD_PROBABILITY
+        is_suspicious = rand.random() < FRAUD_PROBABILITY
 
         # Set amount range based on transaction type
         if is_suspicious:
-            amount = random.uniform(HIGH_RISK_MIN_AMOUNT, HIGH_RISK_MAX_AMOUNT)
-            sender_country = random.choice(SANCTIONED_COUNTRIES) if random.random() < 0.3 else random.choice(self.country_codes)
+            amount = rand.uniform(HIGH_RISK_MIN_AMOUNT, HIGH_RISK_MAX_AMOUNT)
+            sender_country = rand.choice(SANCTIONED_COUNTRIES) if rand.random() < 0.3 else rand.choice(self.country_codes)
         else:
-            amount = random.uniform(MIN_AMOUNT, MAX_AMOUNT)
-            sender_country = random.choice([c for c in self.country_codes if c not in SANCTIONED_COUNTRIES])
+            amount = rand.uniform(MIN_AMOUNT, MAX_AMOUNT)
+            sender_country = rand.choice(self.clean_country_codes)
 
-        receiver_country = random.choice(self.country_codes)
+        receiver_country = rand.choice(self.country_codes)
         
         # Generate transaction data
         transaction = {
-            "transaction_id": fake.uuid4(),
-            "timestamp": datetime.utcnow().isoformat(),
+            "transaction_id": self.fake.uuid4(),
+            "timestamp": self.timestamps(1)[0],
             "sender": self.generate_person_info(),
             "receiver": self.generate_person_info(),
             "amount_usd": round(amount, 2),
@@ -83,51 +184,1028 @@ class TransactionGenerator:
             "transaction_type": "WIRE_TRANSFER",
             "status": "COMPLETED",
             "fee_usd": round(self.calculate_fee(amount), 2),
-            "reference": fake.text(max_nb_chars=50),
+            "reference": self.fake.text(max_nb_chars=50),
             "metadata": {
-                "ip_address": fake.ipv4() if random.random() < 0.8 else fake.ipv6(),
-                "device_id": fake.uuid4(),
-                "user_agent": fake.user_agent(),
-                "channel": random.choice(["MOBILE_APP", "WEB", "BRANCH", "API"]),
+                "ip_address": self.fake.ipv4() if rand.random() < 0.8 else self.fake.ipv6(),
+                "device_id": self.fake.uuid4(),
+                "user_agent": self.fake.user_agent(),
+                "channel": rand.choice(CHANNELS),
             }
         }
         
         return transaction
 
+    def build_pools(self):
+        """Precompute Faker values that generate_batch samples by index."""
+        size = self.pool_size
+        self.pools = {
+            "person": [self.generate_person_info() for _ in range(size)],
+            "reference": [self.fake.text(max_nb_chars=50) for _ in range(size)],
+            "ipv4": [self.fake.ipv4() for _ in range(size)],
+            "ipv6": [self.fake.ipv6() for _ in range(size)],
+            "user_agent": [self.fake.user_agent() for _ in range(size)],
+            "country": np.array(self.country_codes),
+            "clean_country": np.array(self.clean_country_codes),
+            "sanctioned_country": np.array(SANCTIONED_COUNTRIES),
+            "channel": np.array(CHANNELS),
+        }
+
+    def generate_uuids(self, n: int) -> List[str]:
+        """Generate n random (version 4) UUID strings from the NumPy generator."""
+        raw = self.rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+        uuids = []
+        for row in raw:
+            h = row.tobytes().hex()
+            uuids.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+        return uuids
+
+    def generate_batch(self, n: int) -> List[Dict]:
+        """
+        Generate n transactions at once with the same schema and distributions
+        as generate_transaction. Numeric and categorical fields are drawn with
+        NumPy; person, reference, IP and user-agent values are sampled from
+        precomputed pools.
+        """
+        if n <= 0:
+            return []
+        if self.pools is None:
+            self.build_pools()
+        pools = self.pools
+        rng = self.rng
+
+        # Fraud flag and amount ranges
+        is_suspicious = rng.random(n) < FRAUD_PROBABILITY
+        amounts = np.where(
+            is_suspicious,
+            rng.uniform(HIGH_RISK_MIN_AMOUNT, HIGH_RISK_MAX_AMOUNT, n),
+            rng.uniform(MIN_AMOUNT, MAX_AMOUNT, n),
+        )
+        fees = self.calculate_fees(amounts)
+
+        # Sender country: suspicious senders come from a sanctioned country 30% of the time
+        from_sanctioned = is_suspicious & (rng.random(n) < 0.3)
+        sender_countries = np.where(
+            from_sanctioned,
+            pools["sanctioned_country"][rng.integers(0, len(SANCTIONED_COUNTRIES), n)],
+            np.where(
+                is_suspicious,
+                pools["country"][rng.integers(0, len(self.country_codes), n)],
+                pools["clean_country"][rng.integers(0, len(self.clean_country_codes), n)],
+            ),
+        )
+        receiver_countries = pools["country"][rng.integers(0, len(self.country_codes), n)]
+        channels = pools["channel"][rng.integers(0, len(CHANNELS), n)]
+
+        # Pool indices
+        size = self.pool_size
+        sender_idx = rng.integers(0, size, n).tolist()
+        receiver_idx = rng.integers(0, size, n).tolist()
+        reference_idx = rng.integers(0, size, n).tolist()
+        ip_idx = rng.integers(0, size, n).tolist()
+        agent_idx = rng.integers(0, size, n).tolist()
+        use_ipv4 = (rng.random(n) < 0.8).tolist()
+
+        transaction_ids = self.generate_uuids(n)
+        device_ids = self.generate_uuids(n)
+        timestamps = self.timestamps(n)
+
+        amounts = np.round(amounts, 2).tolist()
+        fees = np.round(fees, 2).tolist()
+        sender_countries = sender_countries.tolist()
+        receiver_countries = receiver_countries.tolist()
+        channels = channels.tolist()
+        persons, references = pools["person"], pools["reference"]
+        ipv4, ipv6, user_agents = pools["ipv4"], pools["ipv6"], pools["user_agent"]
+
+        return [
+            {
+                "transaction_id": transaction_ids[i],
+                "timestamp": timestamps[i],
+                "sender": dict(persons[sender_idx[i]]),
+                "receiver": dict(persons[receiver_idx[i]]),
+                "amount_usd": amounts[i],
+                "sender_country": sender_countries[i],
+                "receiver_country": receiver_countries[i],
+                "transaction_type": "WIRE_TRANSFER",
+                "status": "COMPLETED",
+                "fee_usd": fees[i],
+                "reference": references[reference_idx[i]],
+                "metadata": {
+                    "ip_address": ipv4[ip_idx[i]] if use_ipv4[i] else ipv6[ip_idx[i]],
+                    "device_id": device_ids[i],
+                    "user_agent": user_agents[agent_idx[i]],
+                    "channel": channels[i],
+                }
+            }
+            for i in range(n)
+        ]
+
+def make_event(data: Dict) -> EventData:
+    """Build an EventData in the configured wire format, tagged with its content type."""
+    body, content_type = encode_event_body(data)
+    event = EventData(body)
+    event.content_type = content_type
+    return event
+
+def make_compressed_event(transactions: List[Dict], content_encoding: str) -> EventData:
+    """Pack transactions into one compressed EventData tagged with its content encoding."""
+    body, content_type = encode_group_body(transactions)
+    event = EventData(compress(body, content_encoding))
+    event.content_type = content_type
+    event.properties = {CONTENT_ENCODING_PROPERTY: content_encoding}
+    return event
+
+class ProducerStats:
+    """Running throughput counters for a long-lived producer."""
+
+    def __init__(self, latency_window: int = 10000):
+        self.started_at = time.monotonic()
+        self.events_sent = 0
+        self.batches_sent = 0
+        self.bytes_sent = 0
+        self.retries = 0
+        self.send_latencies = deque(maxlen=latency_window)
+
+        # Filled in by ProducerPipeline
+        self.queue_depth: Optional[int] = None
+        self.max_queue_depth = 0
+
+    def record_batch(self, events: int, size_in_bytes: int, latency: Optional[float] = None):
+        self.events_sent += events
+        self.batches_sent += 1
+        self.bytes_sent += size_in_bytes
+        if latency is not None:
+            self.send_latencies.append(latency)
+
+    def record_queue_depth(self, depth: int):
+        self.queue_depth = depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """Send latency percentiles in milliseconds over the recent window."""
+        if not self.send_latencies:
+            return {}
+        ordered = sorted(self.send_latencies)
+        last = len(ordered) - 1
+        return {f"p{q}": ordered[min(last, int(round(q / 100 * last)))] * 1000 for q in (50, 95, 99)}
+
+    @property
+    def events_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.events_sent / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_batch(self) -> float:
+        return self.bytes_sent / self.batches_sent if self.batches_sent else 0.0
+
+    def report(self) -> str:
+        report = (f"events={self.events_sent} batches={self.batches_sent} "
+                  f"events/sec={self.events_per_second:.1f} "
+                  f"bytes/batch={self.bytes_per_batch:.0f} retries={self.retries}")
+        percentiles = self.latency_percentiles()
+        if percentiles:
+            report += " send_ms=" + "/".join(f"{value:.1f}" for value in percentiles.values()) + "(p50/p95/p99)"
+        if self.queue_depth is not None:
+            report += f" queue={self.queue_depth} max_queue={self.max_queue_depth}"
+        return report
+
 class EventHubManager:
-    def __init__(self, connection_str: str, eventhub_name: str):
+    def __init__(self, connection_str: str, eventhub_name: str,
+                 max_batch_events: int = PRODUCER_MAX_BATCH_EVENTS,
+                 max_batch_bytes: Optional[int] = PRODUCER_MAX_BATCH_BYTES,
+                 linger_seconds: float = PRODUCER_LINGER_SECONDS,
+                 stats_interval: float = PRODUCER_STATS_INTERVAL,
+                 partition_id: Optional[str] = None,
+                 partition_key: Optional[str] = None,
+                 compression: str = PRODUCER_COMPRESSION,
+                 compression_group: int = PRODUCER_COMPRESSION_GROUP,
+                 send_retries: int = PRODUCER_SEND_RETRIES):
         self.connection_str = connection_str
         self.eventhub_name = eventhub_name
+        self.partition_id = partition_id
+        self.partition_key = partition_key
+
+        # Long-lived producer mode state
+        self.max_batch_events = max_batch_events
+        self.max_batch_bytes = max_batch_bytes
+        self.linger_seconds = linger_seconds
+        self.stats_interval = stats_interval
+        self.producer: Optional[EventHubProducerClient] = None
+        self.batch = None
+        self.batch_opened_at = 0.0
+        self.batch_transactions = 0
+        self.lock = asyncio.Lock()
+
+        # Optional compression: transactions are grouped into one compressed event
+        self.compression = None if compression == "none" else compression
+        self.compression_group = max(compression_group, 1)
+        self.group: List[Dict] = []
+        self.group_opened_at = 0.0
+        self.send_retries = send_retries
+        self.linger_task: Optional[asyncio.Task] = None
+        self.stats = ProducerStats()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """
+        Open one producer client for the lifetime of this manager.
+        Events added afterwards are packed into shared batches instead of
+        opening a connection per transaction.
+        """
+        if self.producer is not None:
+            return
+        self.producer = EventHubProducerClient.from_connection_string(
+            conn_str=self.connection_str,
+            eventhub_name=self.eventhub_name
+        )
+        self.stats = ProducerStats()
+        self.linger_task = asyncio.create_task(self._linger_loop())
+        logging.info("Opened persistent producer for Event Hub: %s", self.eventhub_name)
+
+    async def add_transaction(self, data: Dict):
+        """
+        Add a transaction to the open batch, flushing first when the batch is
+        full or has reached the configured event count. If this raises, the
+        transaction was not accepted.
+        With compression enabled, transactions are first collected into a
+        group that becomes a single compressed event.
+        """
+        if self.producer is None:
+            raise RuntimeError("Producer is not open; call open() first")
+
+        if self.compression is None:
+            event = make_event(data)
+            async with self.lock:
+                await self._add_event_locked(event, 1)
+            return
+
+        async with self.lock:
+            if not self.group:
+                self.group_opened_at = time.monotonic()
+            self.group.append(data)
+            if len(self.group) >= self.compression_group:
+                try:
+                    await self._close_group_locked()
+                except BaseException:
+                    # Not accepted: the caller gets the error and may retry it
+                    self.group.pop()
+                    raise
+
+    async def add_transactions(self, transactions: List[Dict]):
+        for data in transactions:
+            await self.add_transaction(data)
+
+    async def send_transactions(self, transactions: List[Dict]) -> int:
+        """
+        Send transactions in their own batches, independent of the shared
+        open batch, so several callers can have sends in flight at once.
+        Returns the number of batches sent.
+        """
+        if self.producer is None:
+            raise RuntimeError("Producer is not open; call open() first")
+
+        if self.compression is None:
+            events = [(make_event(data), 1) for data in transactions]
+        else:
+            events = [
+                (make_compressed_event(transactions[i:i + self.compression_group], self.compression),
+                 len(transactions[i:i + self.compression_group]))
+                for i in range(0, len(transactions), self.compression_group)
+            ]
+
+        batches = 0
+        batch, batch_transactions = await self._create_batch(), 0
+        for event, count in events:
+            try:
+                batch.add(event)
+            except ValueError:
+                await self._send_with_retry(batch, batch_transactions)
+                batches += 1
+                batch, batch_transactions = await self._create_batch(), 0
+                batch.add(event)
+            batch_transactions += count
+            if len(batch) >= self.max_batch_events:
+                await self._send_with_retry(batch, batch_transactions)
+                batches += 1
+                batch, batch_transactions = await self._create_batch(), 0
+        if len(batch):
+            await self._send_with_retry(batch, batch_transactions)
+            batches += 1
+        return batches
+
+    async def flush(self):
+        """Send the pending compressed group and the open batch, if any."""
+        async with self.lock:
+            await self._close_group_locked()
+            await self._flush_locked()
+
+    async def _close_group_locked(self):
+        if not self.group:
+            return
+        # The group is only released once added, like a batch once sent
+        await self._add_event_locked(make_compressed_event(self.group, self.compression), len(self.group))
+        self.group = []
+
+    async def _add_event_locked(self, event: EventData, transactions: int):
+        # A full batch is shipped before the event is added, never after, so
+        # an error raised here always means the event was not accepted and a
+        # retrying caller does not send it twice
+        if self.batch is not None and len(self.batch) >= self.max_batch_events:
+            await self._flush_locked()
+        if self.batch is None:
+            await self._new_batch()
+        try:
+            self.batch.add(event)
+        except ValueError:
+            # Batch reached its byte limit; ship it and start a new one
+            await self._flush_locked()
+            await self._new_batch()
+            self.batch.add(event)
+        self.batch_transactions += transactions
+
+    async def close(self):
+        """Flush any pending events, close the client and report final stats."""
+        if self.linger_task is not None:
+            self.linger_task.cancel()
+            try:
+                await self.linger_task
+            except asyncio.CancelledError:
+                pass
+            self.linger_task = None
+
+        if self.producer is None:
+            return
+        try:
+            await self.flush()
+        finally:
+            await self.producer.close()
+            self.producer = None
+            logging.info("Producer closed. %s", self.stats.report())
+
+    async def _create_batch(self):
+        options = {}
+        if self.max_batch_bytes:
+            options["max_size_in_bytes"] = self.max_batch_bytes
+        if self.partition_id is not None:
+            options["partition_id"] = self.partition_id
+        elif self.partition_key is not None:
+            options["partition_key"] = self.partition_key
+        return await self.producer.create_batch(**options)
+
+    async def _new_batch(self):
+        self.batch = await self._create_batch()
+        self.batch_opened_at = time.monotonic()
+        self.batch_transactions = 0
+
+    async def _send_with_retry(self, batch, transactions: int):
+        """Send a batch, retrying with exponential backoff, and record its latency."""
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            try:
+                await self.producer.send_batch(batch)
+                break
+            except Exception as e:
+                if attempt >= self.send_retries:
+                    logging.error("Error sending batch of %d events: %s", len(batch), e)
+                    raise
+                attempt += 1
+                self.stats.retries += 1
+                logging.warning("Retrying batch send (%d/%d) after error: %s", attempt, self.send_retries, e)
+                await asyncio.sleep(PRODUCER_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        # Stats count transactions, which differ from events when compressing
+        self.stats.record_batch(transactions, batch.size_in_bytes, time.monotonic() - started_at)
+
+    async def _flush_locked(self):
+        if self.batch is None or len(self.batch) == 0:
+            return
+        # The batch is only released once sent: if every retry fails the error
+        # propagates and the next flush (or the linger loop) sends it again
+        await self._send_with_retry(self.batch, self.batch_transactions)
+        self.batch = None
+
+    async def _linger_loop(self):
+        """Flush batches that have been open longer than the linger timeout."""
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(self.linger_seconds)
+            try:
+                now = time.monotonic()
+                if ((self.batch is not None and now - self.batch_opened_at >= self.linger_seconds)
+                        or (self.group and now - self.group_opened_at >= self.linger_seconds)):
+                    await self.flush()
+            except Exception as e:
+                logging.error("Error in linger flush: %s", e)
+
+            if self.stats_interval and time.monotonic() - last_report >= self.stats_interval:
+                logging.info("Producer stats: %s", self.stats.report())
+                last_report = time.monotonic()
 
     async def send_to_eventhub(self, data: Dict):
         """Send data to Azure Event Hub."""
+        if self.producer is not None:
+            await self.add_transaction(data)
+            return
+
         try:
             producer = EventHubProducerClient.from_connection_string(
                 conn_str=self.connection_str,
                 eventhub_name=self.eventhub_name
             )
-            print(f"Attempting to connect to Event Hub: {self.eventhub_name}")
-            print(f"Using connection string starting with: {self.connection_str[:50]}...")
+            logging.debug("Sending one transaction to Event Hub: %s", self.eventhub_name)
             
             async with producer:
                 event_data_batch = await producer.create_batch()
-                event_data_batch.add(EventData(json.dumps(data)))
+                event_data_batch.add(make_event(data))
                 await producer.send_batch(event_data_batch)
         except Exception as e:
-            print(f"Detailed error in send_to_eventhub: {str(e)}")
-            print(f"Error type: {type(e).__name__}")
+            logging.error("Error in send_to_eventhub (%s): %s", type(e).__name__, e)
             raise
 
+class ProducerPipeline:
+    """
+    Overlaps generation with network I/O. Callers put chunks of transactions
+    on a bounded asyncio.Queue and return immediately; sender tasks drain the
+    queue into batches and send them concurrently through the manager. When
+    the queue is full, put() waits, which slows generation down.
+    """
+
+    _STOP = object()
+
+    def __init__(self, eventhub_manager: EventHubManager, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 senders: int = PIPELINE_SENDERS):
+        self.eventhub_manager = eventhub_manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.senders = senders
+        self.sender_tasks: List[asyncio.Task] = []
+        self.errors = 0
+
+    @property
+    def stats(self) -> ProducerStats:
+        return self.eventhub_manager.stats
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        await self.eventhub_manager.open()
+        self.sender_tasks = [asyncio.create_task(self._sender()) for _ in range(self.senders)]
+
+    async def add_transactions(self, transactions: List[Dict]):
+        """Queue a chunk of transactions, waiting while the queue is full."""
+        if transactions:
+            await self.queue.put(transactions)
+            self.stats.record_queue_depth(self.queue.qsize())
+
+    async def add_transaction(self, data: Dict):
+        await self.add_transactions([data])
+
+    async def flush(self):
+        """Wait until every queued transaction has been sent (or has failed)."""
+        await self.queue.join()
+
+    async def close(self):
+        """Drain the queue, stop the senders and close the manager."""
+        try:
+            await self.flush()
+        finally:
+            for _ in self.sender_tasks:
+                await self.queue.put(self._STOP)
+            await asyncio.gather(*self.sender_tasks, return_exceptions=True)
+            self.sender_tasks = []
+            if self.errors:
+                logging.warning("Producer pipeline finished with %d failed transactions", self.errors)
+            await self.eventhub_manager.close()
+
+    async def _sender(self):
+        max_events = self.eventhub_manager.max_batch_events
+        linger = self.eventhub_manager.linger_seconds
+        while True:
+            item = await self.queue.get()
+            if item is self._STOP:
+                self.queue.task_done()
+                return
+
+            # Top the batch up from the queue until it is big enough or lingered long enough
+            items = [item]
+            pending = len(item)
+            stop = False
+            deadline = time.monotonic() + linger
+            while pending < max_events:
+                try:
+                    if self.queue.empty():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        more = await asyncio.wait_for(self.queue.get(), remaining)
+                    else:
+                        more = self.queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                if more is self._STOP:
+                    stop = True
+                    break
+                items.append(more)
+                pending += len(more)
+            self.stats.record_queue_depth(self.queue.qsize())
+
+            transactions = [data for chunk in items for data in chunk]
+            try:
+                await self.eventhub_manager.send_transactions(transactions)
+            except Exception as e:
+                self.errors += len(transactions)
+                logging.error("Error in pipeline sender: %s", e)
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+
+            if stop:
+                self.queue.task_done()
+                return
+
+def create_sink(eventhub_manager: EventHubManager):
+    """Wrap the manager in a ProducerPipeline when PRODUCER_PIPELINE is enabled."""
+    return ProducerPipeline(eventhub_manager) if PRODUCER_PIPELINE else eventhub_manager
+
+class TokenBucket:
+    """Token bucket rate limiter whose refill rate can change while running."""
+
+    def __init__(self, rate: float, burst_seconds: float = 0.1):
+        self.rate = max(rate, 1e-6)
+        self.burst_seconds = burst_seconds
+        self.tokens = 0.0
+        self.updated_at = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return max(self.rate * self.burst_seconds, 1.0)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = max(rate, 1e-6)
+
+    async def acquire(self, n: int = 1) -> int:
+        """
+        Wait until tokens are available and take up to n of them.
+        Returns the number of tokens granted (at least 1).
+        """
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                granted = min(n, int(self.tokens))
+                self.tokens -= granted
+                return granted
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class LoadProfile:
+    """Target transaction rate as a function of elapsed load-test time."""
+
+    def __init__(self, target_rate: float = LOAD_TARGET_RATE, profile: str = LOAD_PROFILE,
+                 ramp_seconds: float = LOAD_RAMP_SECONDS, steps: int = LOAD_STEPS,
+                 spike_base_fraction: float = LOAD_SPIKE_BASE_FRACTION,
+                 spike_seconds: float = LOAD_SPIKE_SECONDS):
+        if profile not in ("constant", "step", "linear", "spike"):
+            raise ValueError(f"Unknown load profile: {profile}")
+        self.target_rate = target_rate
+        self.profile = profile
+        self.ramp_seconds = ramp_seconds
+        self.steps = max(steps, 1)
+        self.spike_base_fraction = spike_base_fraction
+        self.spike_seconds = spike_seconds
+
+    def rate_at(self, elapsed: float) -> float:
+        if self.profile == "step":
+            # Climb to the target in equal steps spread over the ramp period
+            if self.ramp_seconds <= 0:
+                return self.target_rate
+            step = int(elapsed / (self.ramp_seconds / self.steps)) + 1
+            return self.target_rate * min(step, self.steps) / self.steps
+        if self.profile == "linear":
+            fraction = elapsed / self.ramp_seconds if self.ramp_seconds > 0 else 1.0
+            return self.target_rate * min(max(fraction, 0.01), 1.0)
+        if self.profile == "spike":
+            # Baseline traffic with a full-rate burst at the end of every ramp period
+            in_period = elapsed % self.ramp_seconds if self.ramp_seconds > 0 else 0.0
+            if in_period >= self.ramp_seconds - self.spike_seconds:
+                return self.target_rate
+            return self.target_rate * self.spike_base_fraction
+        return self.target_rate
+
+async def run_load_test(transaction_generator: TransactionGenerator, eventhub_manager: EventHubManager,
+                        profile: LoadProfile, total_count: int = LOAD_TOTAL_COUNT,
+                        duration_seconds: float = LOAD_DURATION_SECONDS,
+                        senders: int = LOAD_SENDERS, chunk_size: int = LOAD_CHUNK_SIZE,
+                        should_stop: Optional[Callable[[], bool]] = None,
+                        progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Drive the producer at the profile's target rate with concurrent senders
+    until the total count or duration is reached, or should_stop() returns
+    True. Progress is printed every 5 seconds, or passed to progress() when
+    given. Returns the achieved rate.
+    """
+    if not total_count and not duration_seconds and should_stop is None:
+        raise ValueError("Load test needs LOAD_TOTAL_COUNT or LOAD_DURATION_SECONDS")
+
+    bucket = TokenBucket(profile.rate_at(0))
+    started_at = time.monotonic()
+    deadline = started_at + duration_seconds if duration_seconds else None
+    counters = {"reserved": 0, "errors": 0}
+    target_integral = [0.0]
+    # A bare manager sends each chunk in its own batches, so senders do not
+    # queue on the shared open batch's lock; a pipeline queues the chunk
+    send = getattr(eventhub_manager, "send_transactions", eventhub_manager.add_transactions)
+    sent_before = eventhub_manager.stats.events_sent
+
+    def sent() -> int:
+        # Transactions in batches the Event Hub accepted, not those still buffered
+        return eventhub_manager.stats.events_sent - sent_before
+
+    def done() -> bool:
+        if total_count and counters["reserved"] >= total_count:
+            return True
+        if should_stop is not None and should_stop():
+            return True
+        return deadline is not None and time.monotonic() >= deadline
+
+    async def sender():
+        while not done():
+            granted = await bucket.acquire(chunk_size)
+            if total_count:
+                granted = min(granted, total_count - counters["reserved"])
+            if granted <= 0 or (deadline is not None and time.monotonic() >= deadline):
+                break
+            counters["reserved"] += granted
+            try:
+                await send(transaction_generator.generate_batch(granted))
+            except Exception as e:
+                counters["errors"] += granted
+                logging.error("Error sending load-test transactions: %s", e)
+
+    async def controller():
+        last_tick = started_at
+        last_report, last_sent = started_at, 0
+        while True:
+            await asyncio.sleep(0.1)
+            now = time.monotonic()
+            rate = profile.rate_at(now - started_at)
+            target_integral[0] += bucket.rate * (now - last_tick)
+            last_tick = now
+            bucket.set_rate(rate)
+            if now - last_report >= 5:
+                total = sent()
+                window_rate = (total - last_sent) / (now - last_report)
+                if progress is not None:
+                    progress({"sent": total, "errors": counters["errors"],
+                              "target_rate": rate, "window_rate": window_rate})
+                else:
+                    logging.info("Load test: target=%.0f tx/s achieved=%.0f tx/s total=%d errors=%d",
+                                 rate, window_rate, total, counters["errors"])
+                last_report, last_sent = now, total
+
+    logging.info("Load test started: profile=%s target=%.0f tx/s senders=%d count=%s duration=%ss",
+                 profile.profile, profile.target_rate, senders, total_count or "-", duration_seconds or "-")
+    control_task = asyncio.create_task(controller())
+    try:
+        await asyncio.gather(*(sender() for _ in range(senders)))
+        await eventhub_manager.flush()
+    finally:
+        control_task.cancel()
+        try:
+            await control_task
+        except asyncio.CancelledError:
+            pass
+
+    elapsed = time.monotonic() - started_at
+    total = sent()
+    result = {
+        "sent": total,
+        "errors": counters["errors"],
+        "elapsed_seconds": round(elapsed, 3),
+        "target_rate": round(target_integral[0] / elapsed, 1) if elapsed > 0 else 0.0,
+        "achieved_rate": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    logging.info("Load test complete: %s", result)
+    return result
+
+def write_corpus(path: str = CORPUS_PATH, count: int = CORPUS_COUNT, seed: int = CORPUS_SEED,
+                 chunk_size: int = 10000) -> int:
+    """
+    Write a seeded, reproducible corpus of transactions to disk.
+    The format follows the extension: .ndjson/.jsonl (optionally .gz) or .parquet.
+    The same seed, count and chunk_size always produce the same transactions.
+    """
+    transaction_generator = TransactionGenerator(seed=seed)
+    written = 0
+
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            while written < count:
+                table = pa.Table.from_pylist(transaction_generator.generate_batch(min(chunk_size, count - written)))
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                writer.write_table(table)
+                written += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wb") as f:
+            while written < count:
+                batch = transaction_generator.generate_batch(min(chunk_size, count - written))
+                f.writelines(encode_transaction(transaction) + b"\n" for transaction in batch)
+                written += len(batch)
+
+    logging.info("Wrote %d transactions (seed=%s) to %s", written, seed, path)
+    return written
+
+def read_corpus(path: str = CORPUS_PATH, chunk_size: int = LOAD_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """Stream a corpus written by write_corpus back as lists of transactions."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield record_batch.to_pylist()
+        return
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        chunk = []
+        for line in f:
+            if line.strip():
+                chunk.append(decode_transaction(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+class LocalEventSink:
+    """
+    Local stand-in for EventHubManager. Events are appended to a NDJSON file,
+    or only counted when no path is given.
+    """
+
+    def __init__(self, path: str = REPLAY_LOCAL_PATH):
+        self.path = path
+        self.file = None
+        self.stats = ProducerStats()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        if self.path:
+            self.file = open(self.path, "wb")
+        self.stats = ProducerStats()
+
+    async def add_transaction(self, data: Dict):
+        body = encode_transaction(data)
+        if self.file is not None:
+            self.file.write(body + b"\n")
+        self.stats.record_batch(1, len(body))
+
+    async def add_transactions(self, transactions: List[Dict]):
+        for data in transactions:
+            await self.add_transaction(data)
+
+    async def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    async def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        logging.info("Local sink closed. %s", self.stats.report())
+
+async def replay_corpus(sink, path: str = CORPUS_PATH, rate: float = REPLAY_RATE,
+                        chunk_size: int = LOAD_CHUNK_SIZE) -> Dict:
+    """
+    Stream a corpus file into an open EventHubManager or LocalEventSink,
+    paced to rate transactions per second (unpaced when rate is 0).
+    """
+    bucket = TokenBucket(rate) if rate else None
+    started_at = time.monotonic()
+    sent = 0
+
+    for chunk in read_corpus(path, chunk_size):
+        position = 0
+        while position < len(chunk):
+            granted = await bucket.acquire(len(chunk) - position) if bucket else len(chunk) - position
+            await sink.add_transactions(chunk[position:position + granted])
+            position += granted
+            sent += granted
+    await sink.flush()
+
+    elapsed = time.monotonic() - started_at
+    result = {
+        "sent": sent,
+        "elapsed_seconds": round(elapsed, 3),
+        "achieved_rate": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    logging.info("Replay of %s complete: %s", path, result)
+    return result
+
+async def discover_partition_ids() -> List[str]:
+    """Ask the Event Hub for its partition ids."""
+    producer = EventHubProducerClient.from_connection_string(
+        conn_str=EVENT_HUB_CONNECTION_STR,
+        eventhub_name=EVENT_HUB_NAME
+    )
+    async with producer:
+        return list(await producer.get_partition_ids())
+
+async def _run_worker(index: int, workers: int, partition_id: Optional[str], partition_key: Optional[str],
+                      stop_event, stats_queue):
+    transaction_generator = TransactionGenerator()
+    eventhub_manager = create_sink(EventHubManager(
+        EVENT_HUB_CONNECTION_STR, EVENT_HUB_NAME,
+        stats_interval=0,
+        partition_id=partition_id,
+        partition_key=partition_key,
+    ))
+
+    def report(progress: Dict):
+        stats_queue.put({"worker": index, "final": False, **progress})
+
+    result = {"sent": 0, "errors": 0}
+    try:
+        async with eventhub_manager:
+            # Each worker takes an equal share of the configured rate and count.
+            # Senders finish the chunk they already generated before stopping,
+            # and closing the manager flushes the last open batch.
+            result = await run_load_test(
+                transaction_generator,
+                eventhub_manager,
+                LoadProfile(target_rate=LOAD_TARGET_RATE / workers),
+                total_count=-(-LOAD_TOTAL_COUNT // workers) if LOAD_TOTAL_COUNT else 0,
+                duration_seconds=LOAD_DURATION_SECONDS,
+                should_stop=stop_event.is_set,
+                progress=report,
+            )
+    except Exception as e:
+        logging.error("Worker %d failed: %s", index, e)
+        result = {**result, "errors": result["errors"] + 1, "failure": str(e)}
+    finally:
+        stats_queue.put({"worker": index, "final": True, **result})
+
+def producer_worker(index: int, workers: int, partition_id: Optional[str], partition_key: Optional[str],
+                    stop_event, stats_queue):
+    """Entry point of one producer worker process."""
+    # The parent turns Ctrl+C into stop_event so workers can drain cleanly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # A spawned worker starts a fresh interpreter without logging configured
+    configure_logging()
+    asyncio.run(_run_worker(index, workers, partition_id, partition_key, stop_event, stats_queue))
+
+def run_producer_pool(workers: int = PRODUCER_WORKERS):
+    """
+    Start one producer process per worker, each pinned to a partition (or a
+    partition key), and aggregate their throughput until they finish or
+    Ctrl+C is pressed.
+    """
+    if not all([EVENT_HUB_CONNECTION_STR, EVENT_HUB_NAME]):
+        raise ValueError("Missing required environment variables")
+
+    partition_ids = PRODUCER_PARTITION_IDS
+    if PRODUCER_PIN_BY == "partition" and not partition_ids:
+        partition_ids = asyncio.run(discover_partition_ids())
+
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = ctx.Event()
+    stats_queue = ctx.Queue()
+    processes = []
+    for index in range(workers):
+        if PRODUCER_PIN_BY == "partition":
+            pin = {"partition_id": partition_ids[index % len(partition_ids)], "partition_key": None}
+        else:
+            pin = {"partition_id": None, "partition_key": f"producer-{index}"}
+        process = ctx.Process(
+            target=producer_worker,
+            args=(index, workers, pin["partition_id"], pin["partition_key"], stop_event, stats_queue),
+            name=f"producer-{index}",
+        )
+        process.start()
+        processes.append(process)
+        logging.info("Started producer worker %d (%s=%s)", index, PRODUCER_PIN_BY,
+                     pin["partition_id"] or pin["partition_key"])
+
+    worker_stats: Dict[int, Dict] = {}
+    finished = set()
+    started_at = time.monotonic()
+    last_report = started_at
+
+    def drain(timeout: float) -> bool:
+        try:
+            update = stats_queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        worker_stats[update["worker"]] = update
+        if update["final"]:
+            finished.add(update["worker"])
+        return True
+
+    def request_shutdown(signum, frame):
+        if not stop_event.is_set():
+            logging.info("Shutdown requested. Draining producer workers...")
+        stop_event.set()
+
+    # Ctrl+C only flags the workers to stop; the loop below keeps collecting
+    # their final stats while they flush what they have already generated
+    previous_handler = signal.signal(signal.SIGINT, request_shutdown)
+    try:
+        while len(finished) < workers:
+            drain(timeout=1.0)
+            if not any(process.is_alive() for process in processes) and stats_queue.empty():
+                break
+            if time.monotonic() - last_report >= PRODUCER_STATS_INTERVAL:
+                elapsed = time.monotonic() - started_at
+                sent = sum(stats["sent"] for stats in worker_stats.values())
+                errors = sum(stats["errors"] for stats in worker_stats.values())
+                logging.info("Producer pool: workers=%d sent=%d rate=%.0f tx/s errors=%d",
+                             workers - len(finished), sent, sent / elapsed, errors)
+                last_report = time.monotonic()
+    finally:
+        stop_event.set()
+        # A worker cannot exit until the stats it queued are read, so keep
+        # reading until every worker has sent its final stats (or died)
+        # before joining them
+        while len(finished) < workers and any(process.is_alive() for process in processes):
+            drain(timeout=0.5)
+        while drain(timeout=0.1):
+            pass
+        for process in processes:
+            process.join()
+        signal.signal(signal.SIGINT, previous_handler)
+
+    elapsed = time.monotonic() - started_at
+    for index in sorted(worker_stats):
+        stats = worker_stats[index]
+        logging.info("Worker %d: sent=%d errors=%d", index, stats["sent"], stats["errors"])
+    sent = sum(stats["sent"] for stats in worker_stats.values())
+    errors = sum(stats["errors"] for stats in worker_stats.values())
+    logging.info("Producer pool complete: sent=%d errors=%d rate=%.0f tx/s",
+                 sent, errors, sent / elapsed if elapsed > 0 else 0)
+
 async def main():
     """Main function to run the transaction generator."""
+    if PRODUCER_MODE == "corpus":
+        write_corpus()
+        return
+
+    if PRODUCER_MODE == "replay" and REPLAY_TARGET == "local":
+        async with LocalEventSink() as sink:
+            await replay_corpus(sink)
+        return
+
     if not all([EVENT_HUB_CONNECTION_STR, EVENT_HUB_NAME]):
         raise ValueError("Missing required environment variables")
 
+    if PRODUCER_MODE == "replay":
+        async with create_sink(EventHubManager(EVENT_HUB_CONNECTION_STR, EVENT_HUB_NAME)) as eventhub_manager:
+            await replay_corpus(eventhub_manager)
+        return
+
+    if PRODUCER_MODE == "load":
+        transaction_generator = TransactionGenerator()
+        async with create_sink(EventHubManager(EVENT_HUB_CONNECTION_STR, EVENT_HUB_NAME)) as eventhub_manager:
+            await run_load_test(transaction_generator, eventhub_manager, LoadProfile())
+        return
+
     transaction_generator = TransactionGenerator()
     eventhub_manager = EventHubManager(EVENT_HUB_CONNECTION_STR, EVENT_HUB_NAME)
+    await eventhub_manager.open()
     
-    print("Transaction generator started. Press Ctrl+C to stop.")
+    logging.info("Transaction generator started. Press Ctrl+C to stop.")
     transactions_sent = 0
+    # Per-transaction lines are sampled; the summary counts every send
+    event_log = EventLog(logging.getLogger(__name__))
 
     try:
         while True:
@@ -142,25 +1220,34 @@ async def main():
                     # Send to Event Hub
                     await eventhub_manager.send_to_eventhub(transaction)
                     transactions_sent += 1
-                    print(f"Sent transaction {transaction['transaction_id']} (Total: {transactions_sent})")
+                    event_log.event("sent", "Sent transaction %s (Total: %d)", transaction['transaction_id'],
+                                    transactions_sent)
+                    event_log.summary()
                     
                     # Wait 15 seconds before next transaction
                     await asyncio.sleep(15)
                 
-                print("Pausing for 60 seconds...")
+                logging.info("Pausing for 60 seconds...")
                 await asyncio.sleep(60)
                 
             except Exception as e:
-                print(f"Error occurred: {str(e)}")
+                logging.error("Error occurred: %s", e)
                 await asyncio.sleep(5)  # Wait before retrying
 
     except KeyboardInterrupt:
-        print(f"\nShutdown requested. Cleaning up...")
+        logging.info("Shutdown requested. Cleaning up...")
     finally:
-        print(f"Shutdown complete. Total transactions sent: {transactions_sent}")
+        await eventhub_manager.close()
+        event_log.summary(force=True)
+        logging.info("Shutdown complete. Total transactions sent: %d", transactions_sent)
 
 if __name__ == "__main__":
+    # Log through a queue so writing to stdout never blocks the event loop
+    configure_logging()
     try:
-        asyncio.run(main())
+        if PRODUCER_MODE == "multiprocess":
+            run_producer_pool()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         pass  # Handle any top-level keyboard interrupts silently
\ No newline at end of file
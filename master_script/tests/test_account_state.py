@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+
+pytest.importorskip("azure.core")
+
+from account_state import AccountStateStore, encode_snapshot, transaction_time
+
+def transaction(transaction_id):
+    return {"transaction_id": transaction_id, "timestamp": "2024-05-01T12:00:00",
+            "amount_usd": 10.0, "sender": {"account_number": "ACC1"}}
+
+def snapshot(store):
+    return encode_snapshot(store.snapshot_rows(), store.clock, dict(store.pending))
+
+def test_replayed_transactions_are_not_counted_twice():
+    store = AccountStateStore()
+    store.evaluate_batch([transaction(f"t{i}") for i in range(30)])
+    store.commit([transaction(f"t{i}") for i in range(20)])
+
+    # Snapshot taken with the checkpoint after t19; t20-t29 are still buffered
+    restored = AccountStateStore()
+    restored.restore(snapshot(store))
+    restored.evaluate_batch([transaction(f"t{i}") for i in range(20, 40)])
+
+    assert restored.accounts["ACC1"].count == 40
+    assert restored.replayed == 10
+
+def test_replayed_transactions_keep_their_flags():
+    store = AccountStateStore()
+    flags = store.evaluate_batch([transaction(f"t{i}") for i in range(25)])
+    assert flags[-1] == ["velocity_spike"]
+
+    restored = AccountStateStore()
+    restored.restore(snapshot(store))
+
+    assert restored.observe(transaction("t24")) == ["velocity_spike"]
+    restored.commit([transaction("t24")])
+    assert "t24" not in restored.pending
+
+def test_snapshot_restores_pending_flags():
+    store = AccountStateStore()
+    store.observe(transaction("t0"))
+
+    data = gzip.decompress(snapshot(store))
+
+    assert b'"pending":{"t0":[]}' in data
+
+def test_string_and_invalid_amounts_are_coerced():
+    store = AccountStateStore()
+    high = dict(transaction("t0"), amount_usd="9500.00")
+
+    assert store.observe(high) == []
+    assert store.observe(dict(transaction("t1"), amount_usd="n/a")) == []
+    assert store.accounts["ACC1"].amount == 9500.0
+
+def test_naive_timestamps_are_utc():
+    assert transaction_time({"timestamp": "1970-01-01T00:01:00"}, 0.0) == 60.0
+    assert transaction_time({"timestamp": "1970-01-01T01:01:00+01:00"}, 0.0) == 60.0
+    assert transaction_time({"timestamp": "yesterday"}, 5.0) == 5.0
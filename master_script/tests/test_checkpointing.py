@@ -0,0 +1,32 @@
+import asyncio
+
+from checkpointing import PartitionCheckpointer
+
+class FakeContext:
+    def __init__(self):
+        self.checkpoints = []
+
+    async def update_checkpoint(self, event):
+        # The older checkpoint takes longer, as a slow request would
+        await asyncio.sleep(0.05 if event == 1 else 0.01)
+        self.checkpoints.append(event)
+
+async def slow_snapshot(partition_id, force):
+    await asyncio.sleep(0.05)
+
+def test_concurrent_checkpoints_never_go_backwards():
+    async def run():
+        context = FakeContext()
+        checkpointer = PartitionCheckpointer(every_events=1, before_checkpoint=slow_snapshot)
+        checkpointer.mark_durable({"0": (context, 1, 1)})
+        first = asyncio.create_task(checkpointer.maybe_checkpoint())
+        await asyncio.sleep(0.01)
+        checkpointer.mark_durable({"0": (context, 2, 1)})
+        busy = asyncio.create_task(checkpointer.maybe_checkpoint())
+        forced = asyncio.create_task(checkpointer.maybe_checkpoint(force=True))
+        return context, await first, await busy, await forced
+
+    context, first, busy, forced = asyncio.run(run())
+
+    assert (first, busy, forced) == (1, 0, 1)
+    assert context.checkpoints == [1, 2]
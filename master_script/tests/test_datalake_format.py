@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datalake_format import encode_file, flatten_transactions
+
+PROCESSING_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+def transaction(transaction_id, timestamp="2025-01-01T10:15:00", amount=125.5):
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": timestamp,
+        "sender": {"name": "A", "account_number": "1"},
+        "receiver": {"name": "B", "account_number": "2"},
+        "amount_usd": amount,
+        "fee_usd": 6.26,
+        "metadata": {"channel": "WEB"},
+    }
+
+def test_bad_timestamp_and_huge_amount_become_null():
+    table = flatten_transactions([
+        transaction("ok"),
+        transaction("bad-timestamp", timestamp="yesterday"),
+        transaction("huge-amount", amount=1e30),
+        transaction("text-amount", amount="12.50"),
+    ], PROCESSING_TIME)
+
+    assert table.num_rows == 4
+    rows = {row["transaction_id"]: row for row in table.to_pylist()}
+    assert rows["ok"]["transactiondate"] == datetime(2025, 1, 1, 10, 15)
+    assert rows["bad-timestamp"]["transactiondate"] is None
+    assert rows["huge-amount"]["amount_usd"] is None
+    assert str(rows["text-amount"]["amount_usd"]) == "12.50"
+    assert rows["bad-timestamp"]["amount_usd"] is not None
+
+def test_timezone_suffixes_are_normalised_to_utc():
+    table = flatten_transactions([
+        transaction("z", timestamp="2025-01-01T10:15:00Z"),
+        transaction("offset", timestamp="2025-01-01T12:15:00+02:00"),
+    ], PROCESSING_TIME)
+
+    assert table.column("transactiondate").to_pylist() == [datetime(2025, 1, 1, 10, 15)] * 2
+
+def test_invalid_values_do_not_fail_the_file():
+    content = encode_file([transaction("bad", timestamp="2025-13-45", amount=float("inf")), transaction("ok")],
+                          PROCESSING_TIME, output_format="parquet")
+
+    table = pq.read_table(pa.BufferReader(content))
+    assert table.column("transaction_id").to_pylist() == ["bad", "ok"]
+    assert table.column("amount_usd").null_count == 1
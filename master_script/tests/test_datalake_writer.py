@@ -0,0 +1,57 @@
+import asyncio
+
+from datalake_writer import DataLakeWriter
+from worker_pool import EncodePool
+
+class FakeFile:
+    def __init__(self):
+        self.content = b""
+
+    async def create_file(self):
+        pass
+
+    async def append_data(self, content, offset, length):
+        self.content += content
+
+    async def flush_data(self, offset):
+        pass
+
+class FakeDirectory:
+    async def create_directory(self):
+        pass
+
+class FakeContainer:
+    def __init__(self):
+        self.files = {}
+
+    def get_directory_client(self, path):
+        return FakeDirectory()
+
+    def get_file_client(self, path):
+        return self.files.setdefault(path, FakeFile())
+
+class FakeService:
+    def __init__(self):
+        self.container = FakeContainer()
+
+    def get_file_system_client(self, name):
+        return self.container
+
+def test_new_csv_columns_roll_to_a_new_file():
+    service = FakeService()
+    writer = DataLakeWriter(service, rolling_containers=["normal"], output_format="csv",
+                            encoder=EncodePool("inline"))
+
+    async def run():
+        first = await writer.write("normal", [{"transaction_id": "t1", "amount_usd": 1}], "b1")
+        same = await writer.write("normal", [{"amount_usd": 2, "transaction_id": "t2"}], "b2")
+        await asyncio.sleep(0.001)  # distinct file names
+        wider = await writer.write("normal", [{"transaction_id": "t3", "amount_usd": 3, "fee_usd": 0.5}], "b3")
+        return first, same, wider
+
+    first, same, wider = asyncio.run(run())
+
+    assert first[0][0] == same[0][0] != wider[0][0]
+    assert service.container.files[first[0][0]].content == b"transaction_id,amount_usd\nt1,1\nt2,2\n"
+    assert service.container.files[wider[0][0]].content == b"transaction_id,amount_usd,fee_usd\nt3,3,0.5\n"
+    assert writer.files_created == 2
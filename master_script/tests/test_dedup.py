@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("azure.core")
+
+from dedup import Deduplicator
+
+def transactions(start, stop):
+    return [{"transaction_id": f"t{index}"} for index in range(start, stop)]
+
+def test_replays_older_than_the_exact_window_are_dropped():
+    dedup = Deduplicator(expected_items=10000, recent_size=100)
+    dedup.commit(transactions(0, 1000))
+
+    unique = dedup.filter(transactions(0, 1000) + transactions(1000, 1100))
+
+    assert unique == transactions(1000, 1100)
+    assert dedup.bloom_only_hits == 900
+
+def test_keep_limits_dedup_to_the_exact_window():
+    dedup = Deduplicator(expected_items=10000, recent_size=100, bloom_only="keep")
+    dedup.commit(transactions(0, 1000))
+
+    assert len(dedup.filter(transactions(0, 1000))) == 900
@@ -0,0 +1,17 @@
+import logging
+
+from event_log import EventLog
+
+def test_routine_lines_do_not_use_up_the_suspicious_budget(caplog):
+    caplog.set_level(logging.INFO)
+    event_log = EventLog(logging.getLogger("test_event_log"), sample_every=1, max_per_second=5)
+
+    for index in range(100):
+        event_log.event("normal", "Normal transaction processed: %s", index)
+    for index in range(3):
+        event_log.event("suspicious", "Suspicious transaction detected: %s", index, sample_every=1)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert sum(message.startswith("Normal") for message in messages) == 5
+    assert sum(message.startswith("Suspicious") for message in messages) == 3
+    assert event_log.suppressed == 95
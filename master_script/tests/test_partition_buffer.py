@@ -0,0 +1,21 @@
+import time
+
+import partition_buffer
+from partition_buffer import FlushPolicy, PartitionBuffer
+
+def test_failed_upload_backs_off_until_it_succeeds(monkeypatch):
+    monkeypatch.setattr(partition_buffer, "FLUSH_RETRY_BACKOFF_SECONDS", 10)
+    monkeypatch.setattr(partition_buffer, "FLUSH_RETRY_MAX_BACKOFF_SECONDS", 25)
+    buffer = PartitionBuffer("0", normal_policy=FlushPolicy(1, 1024, 60))
+    buffer.track("context", "event")
+    buffer.add(buffer.normal, [{"transaction_id": "t1"}], 10)
+    now = time.monotonic()
+
+    for backoff in (10, 20, 25):
+        buffer.restore(buffer.normal, buffer.take(buffer.normal))
+        assert not buffer.due_containers(now)
+        assert buffer.due_containers(now + backoff + 1) == [buffer.normal]
+
+    buffer.complete(buffer.normal, buffer.take(buffer.normal))
+    buffer.add(buffer.normal, [{"transaction_id": "t2"}], 10)
+    assert buffer.due_containers() == [buffer.normal]
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("azure.core")
+
+from partition_state import PartitionState, state_path
+
+class FakeFile:
+    def __init__(self):
+        self.uploads = 0
+
+    async def upload_data(self, content, overwrite=False):
+        self.uploads += 1
+        return {"etag": str(self.uploads)}
+
+def test_state_path_is_keyed_by_partition():
+    assert state_path("dedup/{event_hub}/{consumer_group}/{partition_id}.bin.gz", "hub", "group", "3") \
+        == "dedup/hub/group/3.bin.gz"
+    with pytest.raises(ValueError):
+        state_path("dedup/{event_hub}.bin.gz", "hub", "group", "3")
+
+def test_dedup_snapshot_waits_for_new_ids_and_the_interval():
+    state = PartitionState("0", "hub", "group", stateful=False, dedup=True)
+    state.dedup = state.dedup.__class__(expected_items=1000)
+    file = FakeFile()
+    save = lambda force=False: asyncio.run(state.save_dedup(lambda path: file, force=force))
+
+    assert save(force=True) is None  # nothing committed yet
+    state.dedup.commit([{"transaction_id": "t1"}])
+    assert save() is None  # within DEDUP_SNAPSHOT_SECONDS
+    assert save(force=True) is not None
+    assert save(force=True) is None  # unchanged since
+    assert file.uploads == 1
+    assert state.dedup.etag == "1"
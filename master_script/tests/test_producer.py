@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("azure.eventhub")
+pytest.importorskip("faker")
+
+import producer
+from producer import EventHubManager, ProducerStats
+
+class FakeBatch(list):
+    size_in_bytes = 0
+    add = list.append
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+        self.failing = False
+
+    async def create_batch(self, **options):
+        return FakeBatch()
+
+    async def send_batch(self, batch):
+        if self.failing:
+            raise RuntimeError("unavailable")
+        self.sent.extend(batch)
+
+def manager(**options):
+    eventhub_manager = EventHubManager("connection", "hub", max_batch_bytes=None, send_retries=0, **options)
+    eventhub_manager.producer = FakeProducer()
+    eventhub_manager.stats = ProducerStats()
+    return eventhub_manager
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_a_raised_error_means_the_transaction_was_not_accepted(monkeypatch, compression):
+    monkeypatch.setattr(producer, "PRODUCER_RETRY_BACKOFF_SECONDS", 0)
+    eventhub_manager = manager(max_batch_events=2, compression=compression, compression_group=1)
+
+    async def run():
+        for index in range(2):
+            await eventhub_manager.add_transaction({"transaction_id": f"t{index}"})
+        eventhub_manager.producer.failing = True
+        with pytest.raises(RuntimeError):
+            await eventhub_manager.add_transaction({"transaction_id": "t2"})
+        eventhub_manager.producer.failing = False
+        # The caller retries the transaction that was refused
+        await eventhub_manager.add_transaction({"transaction_id": "t2"})
+        await eventhub_manager.flush()
+
+    asyncio.run(run())
+
+    assert len(eventhub_manager.producer.sent) == 3
+    assert eventhub_manager.stats.events_sent == 3
@@ -0,0 +1,36 @@
+import json
+
+import rule_engine
+from rule_engine import RuleEngine
+
+def write_rules(tmp_path, rules):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": rules}))
+    return str(path)
+
+def test_shipped_rules_use_the_threshold_setting(monkeypatch):
+    monkeypatch.setattr(rule_engine, "HIGH_AMOUNT_THRESHOLD", 5000.0)
+
+    engine = RuleEngine()
+
+    assert engine.source.endswith("transaction_rules.json")
+    assert engine.evaluate({"amount_usd": 5000.0}) == ["high_amount"]
+    assert engine.evaluate({"amount_usd": 4999.0}) == []
+
+def test_threshold_setting_overrides_the_file(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(rule_engine, "HIGH_AMOUNT_THRESHOLD_SETTING", "5000")
+    monkeypatch.setattr(rule_engine, "HIGH_AMOUNT_THRESHOLD", 5000.0)
+    path = write_rules(tmp_path, [{"name": "high_amount", "type": "amount_at_least", "threshold": 1000000}])
+
+    engine = RuleEngine(path)
+
+    assert engine.evaluate({"amount_usd": 6000.0}) == ["high_amount"]
+    assert "overrides the high_amount threshold" in caplog.text
+
+def test_file_threshold_applies_without_the_setting(tmp_path, monkeypatch):
+    monkeypatch.setattr(rule_engine, "HIGH_AMOUNT_THRESHOLD_SETTING", None)
+    path = write_rules(tmp_path, [{"name": "high_amount", "type": "amount_at_least", "threshold": 1000000}])
+
+    engine = RuleEngine(path)
+
+    assert engine.evaluate({"amount_usd": 6000.0}) == []
@@ -0,0 +1,40 @@
+import pytest
+
+from transaction_codec import available_codecs, decode_bodies, encode_group_body, get_codec
+
+PARTY = {"name": "A", "address": "1 Road", "account_number": "1", "bank_name": "Bank", "swift_code": "BANKGB2L"}
+TRANSACTION = {
+    "transaction_id": "tx-1",
+    "timestamp": "2025-01-01T00:00:00",
+    "sender": PARTY,
+    "receiver": PARTY,
+    "amount_usd": 125.5,
+    "sender_country": "GBR",
+    "receiver_country": "USA",
+    "transaction_type": "WIRE",
+    "status": "COMPLETED",
+    "fee_usd": 6.26,
+    "reference": "REF1",
+    "metadata": {"ip_address": "10.0.0.1", "device_id": "d1", "user_agent": "ua", "channel": "WEB"},
+}
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_unknown_fields_survive_round_trip(name):
+    codec = get_codec(name)
+    transaction = dict(TRANSACTION, risk_score=0.7, sender=dict(TRANSACTION["sender"], kyc_level=2))
+
+    assert codec.decode(codec.encode(transaction)) == transaction
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_mistyped_fields_are_kept(name):
+    codec = get_codec(name)
+    transaction = dict(TRANSACTION, amount_usd="125.50")
+
+    assert codec.decode(codec.encode(transaction)) == transaction
+
+def test_unknown_fields_survive_json_group():
+    transactions = [dict(TRANSACTION, risk_score=i) for i in range(3)]
+
+    body, content_type = encode_group_body(transactions, wire_format="json")
+
+    assert decode_bodies(body, content_type) == transactions
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Callable, Dict, Optional
+
+# Where batch encoding runs: a thread pool, a process pool, or inline on the event loop
+ENCODE_POOL = os.getenv("ENCODE_POOL", "thread")  # thread | process | inline
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", min(4, os.cpu_count() or 1)))
+ENCODE_MAX_QUEUED = int(os.getenv("ENCODE_MAX_QUEUED", 8))  # batches waiting for a worker
+# How often the event loop lag is sampled
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", 0.1))  # seconds
+
+class EncodePool:
+    """
+    Runs CPU-bound batch encoding (CSV, Parquet, compression) off the event
+    loop, so the loop only does I/O. At most `workers + max_queued` batches
+    are handed to the pool at once; further callers wait, bounding the
+    memory held by queued batches.
+    """
+
+    def __init__(self, kind: str = ENCODE_POOL, workers: int = ENCODE_WORKERS,
+                 max_queued: int = ENCODE_MAX_QUEUED):
+        self.kind = kind
+        self.executor: Optional[Executor] = None
+        if kind == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode")
+        elif kind == "process":
+            # Arguments and results are pickled; worth it only for large batches
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        elif kind != "inline":
+            raise ValueError(f"Unknown encode pool: {kind}")
+        self.slots = asyncio.Semaphore(workers + max_queued)
+        self.batches = 0
+        self.encode_seconds = 0.0
+
+    async def run(self, function: Callable, *args):
+        """Run function(*args) in the pool and return its result."""
+        start = time.perf_counter()
+        try:
+            if self.executor is None:
+                return function(*args)
+            async with self.slots:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.batches += 1
+            self.encode_seconds += time.perf_counter() - start
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "pool": self.kind,
+            "batches": self.batches,
+            "avg_encode_ms": self.encode_seconds / self.batches * 1000 if self.batches else 0.0,
+        }
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag: how much later than requested a sleeping task
+    wakes up. Any synchronous work on the loop (such as encoding a batch)
+    shows up directly as lag for every partition's receive and checkpoint.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, window: int = 3000):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def report(self) -> Dict[str, float]:
+        """Lag percentiles over the recent window, in milliseconds."""
+        if not self.samples:
+            return {"samples": 0}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "p50_ms": statistics.median(ordered) * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            "max_ms": self.max_lag * 1000,
+        }
+
+def benchmark(batches: int = 20, batch_size: int = 5000, output_format: str = "csv") -> Dict[str, Dict[str, float]]:
+    """
+    Encode batches the way the consumers do, inline on the loop and in each
+    pool, and report the event loop lag observed meanwhile.
+    """
+    from datalake_format import encode_file
+    from transaction_codec import SAMPLE_TRANSACTION
+
+    transactions = [dict(SAMPLE_TRANSACTION, transaction_id=str(i)) for i in range(batch_size)]
+
+    async def run(kind: str) -> Dict[str, float]:
+        pool = EncodePool(kind)
+        monitor = LoopLagMonitor(interval=0.005)
+        monitor.start()
+        start = time.perf_counter()
+        # Several partitions flushing at once
+        await asyncio.gather(*(pool.run(encode_file, transactions, datetime.now(), output_format)
+                               for _ in range(batches)))
+        elapsed = time.perf_counter() - start
+        # Let the last sleep overlapping the encoding report its lag
+        await asyncio.sleep(monitor.interval * 2)
+        await monitor.stop()
+        pool.shutdown()
+        return dict(monitor.report(), seconds=elapsed)
+
+    return {kind: asyncio.run(run(kind)) for kind in ("inline", "thread", "process")}
+
+if __name__ == "__main__":
+    for kind, result in benchmark().items():
+        print(f"{kind:8s} " + "  ".join(f"{key}={value:.1f}" for key, value in result.items()))
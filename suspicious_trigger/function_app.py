@@ -129,6 +129,43 @@ def send_slack_alert(message: str) -> bool:
         logging.error(f"Unexpected error sending Slack alert: {str(e)}")
         return False
 
+def unflatten_transaction(row: dict) -> dict:
+    """Rebuild the nested sender/receiver fields from a flattened (Parquet) row."""
+    transaction = dict(row)
+    for party in ('sender', 'receiver'):
+        transaction[party] = {
+            field: row.get(f"{party}_{field}")
+            for field in ('name', 'address', 'account_number', 'bank_name', 'swift_code')
+        }
+    transaction['timestamp'] = row.get('transactiondate')
+    return transaction
+
+def alert_transactions(df: pd.DataFrame, file_name: str, flattened: bool = False):
+    """Send one Slack alert per transaction row."""
+    if df.empty:
+        logging.warning(f"Empty file received: {file_name}")
+        return
+        
+    processed_count = 0
+    error_count = 0
+    
+    for row in df.to_dict('records'):
+        try:
+            transaction = unflatten_transaction(row) if flattened else row
+            slack_message = format_slack_message(transaction, file_name)
+            
+            if send_slack_alert(slack_message):
+                processed_count += 1
+            else:
+                error_count += 1
+                
+        except Exception as e:
+            error_count += 1
+            logging.error(f"Error processing transaction: {str(e)}")
+            continue
+            
+    logging.info(f"File processing complete. Processed: {processed_count}, Errors: {error_count}")
+
 @app.blob_trigger(
     arg_name="myblob",
     path="suspicious-transactions/{year}/{month}/{day}/{name}.csv",
@@ -141,32 +178,28 @@ def monitor_suspicious_transactions(myblob: func.InputStream):
     try:
         # Read CSV with proper encoding and error handling
         df = pd.read_csv(io.BytesIO(myblob.read()), encoding='utf-8')
-        
-        if df.empty:
-            logging.warning(f"Empty file received: {myblob.name}")
-            return
-            
-        processed_count = 0
-        error_count = 0
-        
-        for _, row in df.iterrows():
-            try:
-                transaction = row.to_dict()
-                slack_message = format_slack_message(transaction, myblob.name)
+        alert_transactions(df, myblob.name)
                 
-                if send_slack_alert(slack_message):
-                    processed_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                error_count += 1
-                logging.error(f"Error processing transaction: {str(e)}")
-                continue
-                
-        logging.info(f"File processing complete. Processed: {processed_count}, Errors: {error_count}")
+    except Exception as e:
+        error_message = f":x: *ERROR PROCESSING FILE*\nFile: {myblob.name}\nError: {str(e)}"
+        logging.error(f"File processing error: {str(e)}")
+        send_slack_alert(error_message)
+
+@app.blob_trigger(
+    arg_name="myblob",
+    path="suspicious-transactions/year={year}/month={month}/day={day}/hour={hour}/{name}.parquet",
+    connection="airflowdatalakestaging_STORAGE"
+)
+def monitor_suspicious_parquet(myblob: func.InputStream):
+    """Monitor and process suspicious transactions written as flattened Parquet."""
+    logging.info(f"Processing new file: {myblob.name}")
+    
+    try:
+        # Flat columns need no JSON re-parsing
+        df = pd.read_parquet(io.BytesIO(myblob.read()))
+        alert_transactions(df, myblob.name, flattened=True)
                 
     except Exception as e:
         error_message = f":x: *ERROR PROCESSING FILE*\nFile: {myblob.name}\nError: {str(e)}"
         logging.error(f"File processing error: {str(e)}")
-        send_slack_alert(error_message)
\ No newline at end of file
+        send_slack_alert(error_message)